@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from functools import cached_property
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -47,6 +48,15 @@ class Settings:
     reranker_api_key: str = "empty"
     reranker_score_threshold: float = 0.0
 
+    @cached_property
+    def db_missing_fields(self) -> tuple[str, ...]:
+        """Names of required DB settings that are empty; computed once per Settings."""
+        return tuple(
+            name
+            for name, value in (("db_host", self.db_host), ("db_user", self.db_user), ("db_name", self.db_name))
+            if not value
+        )
+
     @staticmethod
     def load() -> "Settings":
         base_url = _get("LLM_BASE_URL")
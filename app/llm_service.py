@@ -1,6 +1,7 @@
 import json
 from decimal import Decimal
 
+import httpx
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_openai import ChatOpenAI
 
@@ -8,7 +9,7 @@ from app.config import Settings
 
 
 class LLMChatSession:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, http_client: httpx.Client | None = None):
         self.settings = settings
         self.client = ChatOpenAI(
             base_url=settings.llm_base_url,
@@ -16,6 +17,7 @@ class LLMChatSession:
             model=settings.llm_model,
             temperature=settings.temperature,
             max_tokens=settings.max_tokens,
+            http_client=http_client,
         )
         self.history = [
             SystemMessage(content="你是個助理，請用繁體中文回答，回答要清楚、簡潔。")
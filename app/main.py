@@ -1,11 +1,19 @@
 import argparse
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from decimal import Decimal
+import itertools
 import json
+import logging
+import os
 from pathlib import Path
+import re
+import sys
 import time
+from typing import Iterable, Iterator
 
 from dotenv import load_dotenv
+import httpx
 
 from app.chart_planner import build_chart_spec
 from app.chart_renderer import render_chart
@@ -13,60 +21,132 @@ from app.cli_ui import print_startup_ui
 from app.config import Settings
 from app.intent_router import IntentType, classify_intent
 from app.llm_service import LLMChatSession
-from app.query_executor import SQLQueryExecutor
+from app.query_executor import QueryResult, SQLQueryExecutor
 from app.semantic_loader import get_governance, load_semantic_layer
 from app.semantic_validator import validate_semantic_plan
-from app.sql_compiler import compile_sql_from_semantic_plan
+from app.sql_compiler import (
+    compile_parameterized_sql_from_semantic_plan,
+    inline_sql_params,
+    rebind_between_params,
+)
 from app.sql_planner import merge_llm_selection_into_plan
 from app.token_matcher import SemanticTokenMatcher
 
 
+# per-turn Step B-J pipeline report; user-facing CLI status and replies use print.
+# the handler lives here so the report is emitted whichever entry point drives a turn
+logger = logging.getLogger("smartbi")
+if not logger.handlers:
+    _report_handler = logging.StreamHandler(sys.stdout)
+    _report_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_report_handler)
+logger.setLevel(logging.INFO)
+# keep pipeline output out of the root logger used by HTTP client libraries
+logger.propagate = False
+
+_DARK_BLOCK_PREFIX = "\033[48;5;236m\033[97m"
+_ANSI_RESET = "\033[0m"
+
+# the bundled seed file is checked in under a misspelled name
+_SQL_FILE_TYPO_FALLBACKS = {"example_data.sql": "exmaple_data.sql"}
+
+_CHART_TYPE_TERMS = (
+    (("圓餅圖", "餅圖", "餅形圖", "pie"), "pie"),
+    (("散佈圖", "散点图", "scatter"), "scatter"),
+    (("折線圖", "線圖", "line"), "line"),
+    (("直條圖", "柱狀圖", "長條圖", "bar"), "bar"),
+)
+_CHART_TYPE_PRIORITY = tuple(chart_type for _, chart_type in _CHART_TYPE_TERMS)
+_CHART_TYPE_BY_TERM = {term: chart_type for terms, chart_type in _CHART_TYPE_TERMS for term in terms}
+# longest terms first so e.g. 圓餅圖 wins over 餅圖 at the same position
+_CHART_TERM_RE = re.compile("|".join(re.escape(t) for t in sorted(_CHART_TYPE_BY_TERM, key=len, reverse=True)))
+
+
+@dataclass(frozen=True, slots=True)
+class TurnMetrics:
+    validation_ok: bool
+    validation_error_codes: list[str]
+    selected_metrics_count: int
+    selected_dimensions_count: int
+    selected_filters_count: int
+    compile_elapsed_ms: float
+    sql_generated: bool
+
+
 def _date_tag() -> str:
-    return datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
+    return time.strftime("[%Y-%m-%d %H:%M:%S]", time.localtime())
 
 
 def _pretty(data: object) -> str:
     def _json_fallback(value: object) -> object:
         if isinstance(value, Decimal):
             return float(value)
+        if isinstance(value, TurnMetrics):
+            return asdict(value)
         return str(value)
 
     return json.dumps(data, ensure_ascii=False, indent=2, default=_json_fallback)
 
 
+class _LazyPretty:
+    """Defer `_pretty` until a log record is actually emitted."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: object):
+        self.data = data
+
+    def __str__(self) -> str:
+        return _pretty(self.data)
+
+
 def _dark_log_block(text: str) -> str:
     # ANSI dark style block (fallback to plain text if terminal does not support ANSI)
-    return f"\033[48;5;236m\033[97m{text}\033[0m"
+    return _DARK_BLOCK_PREFIX + text + _ANSI_RESET
+
+
+def _await_result_summary(summary_future: Future[str], zero_rows_notice: str) -> str:
+    try:
+        summary_text = summary_future.result()
+    except Exception as summary_exc:
+        if zero_rows_notice:
+            return f"Step J 數據摘要：\n{zero_rows_notice}\n（摘要生成失敗：{summary_exc}）"
+        return f"Step J 數據摘要：略過（摘要生成失敗：{summary_exc}）"
+    summary_body = f"{zero_rows_notice}\n{summary_text}" if zero_rows_notice else summary_text
+    return _dark_log_block(f"Step J 數據摘要：\n{summary_body}")
+
+
+def _configure_logging() -> None:
+    level_name = (os.getenv("SMARTBI_LOG") or "INFO").strip().upper()
+    level = logging.getLevelName(level_name)
+    logger.setLevel(level if isinstance(level, int) else logging.INFO)
 
 
 def _detect_preferred_chart_type(features: dict) -> str | None:
-    keywords = [
-        *(features.get("tokens", []) or []),
-        *(features.get("dimensions", []) or []),
-        *(features.get("filters", []) or []),
-    ]
-    text = " ".join(str(k) for k in keywords)
-    mapping = [
-        (("圓餅圖", "餅圖", "餅形圖", "pie"), "pie"),
-        (("散佈圖", "散点图", "scatter"), "scatter"),
-        (("折線圖", "線圖", "line"), "line"),
-        (("直條圖", "柱狀圖", "長條圖", "bar"), "bar"),
-    ]
-    for terms, chart_type in mapping:
-        if any(term in text for term in terms):
+    matched: set[str] = set()
+    for key in ("tokens", "dimensions", "filters"):
+        for keyword in features.get(key, []) or []:
+            for hit in _CHART_TERM_RE.finditer(str(keyword)):
+                matched.add(_CHART_TYPE_BY_TERM[hit.group(0)])
+    for chart_type in _CHART_TYPE_PRIORITY:
+        if chart_type in matched:
             return chart_type
     return None
 
 
+def _is_time_between_filter(item: object) -> bool:
+    if not isinstance(item, dict):
+        return False
+    op = str(item.get("op", "") or "").lower()
+    field = str(item.get("field", "") or "")
+    return op == "between" and field.endswith(".biz_date")
+
+
 def _find_time_between_filter(enhanced_plan: dict) -> tuple[str, str] | None:
     for item in enhanced_plan.get("selected_filters", []) or []:
-        if not isinstance(item, dict):
+        if not _is_time_between_filter(item):
             continue
-        op = str(item.get("op", "") or "").lower()
-        field = str(item.get("field", "") or "")
         value = item.get("value")
-        if op != "between" or not field.endswith(".biz_date"):
-            continue
         if not isinstance(value, list) or len(value) != 2:
             continue
         start = str(value[0] or "").strip()
@@ -147,30 +227,13 @@ def _compute_adjusted_time_range(
 
 def _replace_time_between_filter(enhanced_plan: dict, start: str, end: str) -> dict | None:
     filters = enhanced_plan.get("selected_filters", []) or []
-    updated_filters: list[dict] = []
-    replaced = False
-
-    for item in filters:
-        if not isinstance(item, dict):
-            updated_filters.append(item)
+    for idx, item in enumerate(filters):
+        if not _is_time_between_filter(item):
             continue
-        op = str(item.get("op", "") or "").lower()
-        field = str(item.get("field", "") or "")
-        if (not replaced) and op == "between" and field.endswith(".biz_date"):
-            copied = dict(item)
-            copied["value"] = [start, end]
-            copied["source"] = "auto_adjusted_time_bounds"
-            updated_filters.append(copied)
-            replaced = True
-            continue
-        updated_filters.append(item)
-
-    if not replaced:
-        return None
-
-    plan_copy = dict(enhanced_plan)
-    plan_copy["selected_filters"] = updated_filters
-    return plan_copy
+        # only the first matching filter is rebound; other filter dicts are reused as-is
+        replaced = {**item, "value": [start, end], "source": "auto_adjusted_time_bounds"}
+        return {**enhanced_plan, "selected_filters": [*filters[:idx], replaced, *filters[idx + 1 :]]}
+    return None
 
 
 def _build_empty_result_hint(
@@ -190,38 +253,99 @@ def _build_empty_result_hint(
     )
 
 
-def _split_sql_script(script_text: str) -> list[str]:
-    statements: list[str] = []
-    chunks = script_text.split(";")
-    for chunk in chunks:
-        lines = []
-        for line in chunk.splitlines():
-            stripped = line.strip()
-            if stripped.startswith("--"):
+def _retry_with_data_time_bounds(
+    enhanced_plan: dict,
+    query_sql: str,
+    query_params: tuple,
+    semantic_layer: dict,
+    executor: SQLQueryExecutor,
+    max_rows: int,
+) -> tuple[dict, str, tuple, QueryResult, str] | None:
+    requested_range = _find_time_between_filter(enhanced_plan)
+    if not requested_range:
+        return None
+    data_range = _get_dataset_time_bounds(enhanced_plan, semantic_layer, executor)
+    if not data_range:
+        return None
+    adjusted_range = _compute_adjusted_time_range(*requested_range, *data_range)
+    if not adjusted_range or adjusted_range == requested_range:
+        return None
+    adjusted_plan = _replace_time_between_filter(enhanced_plan, *adjusted_range)
+    if adjusted_plan is None:
+        return None
+
+    # only the time values differ, so rebind them and keep the compiled template
+    adjusted_sql = query_sql
+    adjusted_params = rebind_between_params(query_params, requested_range, adjusted_range)
+    if adjusted_params is None:
+        adjusted_sql, adjusted_params = compile_parameterized_sql_from_semantic_plan(
+            enhanced_plan=adjusted_plan,
+            semantic_layer=semantic_layer,
+        )
+    result = executor.run(adjusted_sql, max_rows=max_rows, params=adjusted_params)
+    hint = _build_empty_result_hint(*requested_range, *data_range, *adjusted_range)
+    return adjusted_plan, adjusted_sql, adjusted_params, result, hint
+
+
+def _iter_sql_statements(lines: Iterable[str]) -> Iterator[str]:
+    """Yield `;`-terminated statements while reading, skipping `--` comment lines."""
+    buffer: list[str] = []
+    quote = ""
+    escaped = False
+    for line in lines:
+        if not quote:
+            if line.strip().startswith("--"):
                 continue
-            lines.append(line)
-        statement = "\n".join(lines).strip()
-        if statement:
-            statements.append(statement)
-    return statements
+            if ";" not in line and "'" not in line and '"' not in line and "`" not in line:
+                buffer.append(line)
+                continue
+
+        start = 0
+        prev = ""
+        for idx, ch in enumerate(line):
+            if quote:
+                if escaped:
+                    escaped = False
+                elif ch == "\\" and quote != "`":
+                    # backslash escapes only apply inside string literals, not backtick identifiers
+                    escaped = True
+                elif ch == quote:
+                    quote = ""
+            elif ch == "-" and prev == "-" and (idx + 1 == len(line) or line[idx + 1].isspace()):
+                # trailing `-- ` comment: keep the text, but do not scan it for quotes/semicolons.
+                # MySQL needs whitespace after `--`, so `a--b` stays arithmetic
+                break
+            elif ch in ("'", '"', "`"):
+                quote = ch
+            elif ch == ";":
+                buffer.append(line[start:idx])
+                statement = "".join(buffer).strip()
+                buffer = []
+                start = idx + 1
+                if statement:
+                    yield statement
+            prev = ch
+        buffer.append(line[start:])
+
+    statement = "".join(buffer).strip()
+    if statement:
+        yield statement
 
 
 def _run_sql_script_file(sql_file: str, settings: Settings) -> bool:
     file_path = Path(sql_file)
-    if not file_path.exists() and file_path.name == "example_data.sql":
-        typo_fallback = file_path.with_name("exmaple_data.sql")
-        if typo_fallback.exists():
-            file_path = typo_fallback
+    if not file_path.exists():
+        fallback_name = _SQL_FILE_TYPO_FALLBACKS.get(file_path.name)
+        if fallback_name:
+            typo_fallback = file_path.with_name(fallback_name)
+            if typo_fallback.exists():
+                file_path = typo_fallback
 
     if not file_path.exists():
         print(f"[Batch SQL] 檔案不存在：{file_path}")
         return False
 
-    missing_db_fields = [
-        name
-        for name, value in (("db_host", settings.db_host), ("db_user", settings.db_user), ("db_name", settings.db_name))
-        if not value
-    ]
+    missing_db_fields = settings.db_missing_fields
     if missing_db_fields:
         print(f"[Batch SQL] 無法執行 SQL 檔案，缺少 DB 設定：{', '.join(missing_db_fields)}")
         return False
@@ -232,39 +356,42 @@ def _run_sql_script_file(sql_file: str, settings: Settings) -> bool:
         print(f"[Batch SQL] 缺少 pymysql 依賴：{exc}")
         return False
 
-    script_text = file_path.read_text(encoding="utf-8")
-    statements = _split_sql_script(script_text)
-    if not statements:
-        print(f"[Batch SQL] 檔案無可執行語句：{file_path}")
-        return True
-
-    print(f"[Batch SQL] 開始執行：{file_path}（共 {len(statements)} 條語句）")
-    try:
-        conn = pymysql.connect(
-            host=settings.db_host,
-            port=settings.db_port,
-            user=settings.db_user,
-            password=settings.db_password or "",
-            database=settings.db_name,
-            autocommit=True,
-        )
-    except Exception as exc:
-        print(f"[Batch SQL] 連線失敗：{exc}")
-        return False
+    with file_path.open("r", encoding="utf-8") as script_file:
+        statements = _iter_sql_statements(script_file)
+        first_statement = next(statements, None)
+        if first_statement is None:
+            print(f"[Batch SQL] 檔案無可執行語句：{file_path}")
+            return True
 
-    try:
-        with conn.cursor() as cursor:
-            for idx, statement in enumerate(statements, start=1):
-                try:
-                    cursor.execute(statement)
-                    print(f"[Batch SQL] ({idx}/{len(statements)}) OK")
-                except Exception as exc:
-                    print(f"[Batch SQL] ({idx}/{len(statements)}) FAILED: {exc}")
-                    return False
-    finally:
-        conn.close()
+        print(f"[Batch SQL] 開始執行：{file_path}")
+        try:
+            conn = pymysql.connect(
+                host=settings.db_host,
+                port=settings.db_port,
+                user=settings.db_user,
+                password=settings.db_password or "",
+                database=settings.db_name,
+                autocommit=True,
+            )
+        except Exception as exc:
+            print(f"[Batch SQL] 連線失敗：{exc}")
+            return False
 
-    print("[Batch SQL] 執行完成。")
+        executed = 0
+        try:
+            with conn.cursor() as cursor:
+                for idx, statement in enumerate(itertools.chain((first_statement,), statements), start=1):
+                    try:
+                        cursor.execute(statement)
+                        print(f"[Batch SQL] ({idx}) OK")
+                    except Exception as exc:
+                        print(f"[Batch SQL] ({idx}) FAILED: {exc}")
+                        return False
+                    executed = idx
+        finally:
+            conn.close()
+
+    print(f"[Batch SQL] 執行完成（共 {executed} 條語句）。")
     return True
 
 
@@ -278,38 +405,14 @@ def _parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def main():
-    args = _parse_args()
-    load_dotenv()
-    settings = Settings.load()
-
-    if args.sql_file:
-        _run_sql_script_file(args.sql_file, settings)
-        return
-
-    session = LLMChatSession(settings)
-    semantic_layer = load_semantic_layer()
-    governance_limits = get_governance(semantic_layer)
-    matcher = SemanticTokenMatcher(
-        "app/semantics/smartbi_demo_macau_banking_semantic.yaml",
-        embedding_base_url=settings.embedding_url,
-        embedding_model=settings.embedding_model,
-        embedding_api_key=settings.embedding_api_key,
-        reranker_base_url=settings.reranker_url,
-        reranker_model=settings.reranker_model,
-        reranker_api_key=settings.reranker_api_key,
-        reranker_score_threshold=settings.reranker_score_threshold,
-    )
-
-    print_startup_ui(
-        model=settings.llm_model,
-        base_url=settings.llm_base_url,
-        version="1.0.0",
-        app_name="SmartBI Chat CLI",
-        framework="LangChain",
-        clear_screen=True,
-    )
-
+def _chat_loop(
+    session: LLMChatSession,
+    matcher: SemanticTokenMatcher,
+    semantic_layer: dict,
+    governance_limits: dict,
+    settings: Settings,
+    background: ThreadPoolExecutor,
+) -> None:
     while True:
         try:
             user_input = input(f"{_date_tag()}You> ").strip()
@@ -346,19 +449,16 @@ def main():
             )
 
             generated_sql = ""
+            query_params: tuple = ()
             compile_start = time.perf_counter()
             if validation.get("ok"):
-                generated_sql = compile_sql_from_semantic_plan(
+                generated_sql, query_params = compile_parameterized_sql_from_semantic_plan(
                     enhanced_plan=enhanced_plan,
                     semantic_layer=semantic_layer,
                 )
             compile_ms = round((time.perf_counter() - compile_start) * 1000, 2)
 
-            missing_db_fields = [
-                name
-                for name, value in (("db_host", settings.db_host), ("db_user", settings.db_user), ("db_name", settings.db_name))
-                if not value
-            ]
+            missing_db_fields = settings.db_missing_fields
             chart_status = (
                 "Step G/H/I 略過：缺少 DB 設定 " + ", ".join(missing_db_fields)
                 if missing_db_fields
@@ -371,6 +471,8 @@ def main():
                 summary_status = _dark_log_block(f"Step J 數據摘要（錯誤修飾）：\n{summary_text}")
                 chart_status = "Step G/H/I 略過：因 Step E 規則校驗失敗，停止後續步驟。"
             elif generated_sql and not missing_db_fields:
+                summary_future: Future[str] | None = None
+                zero_rows_notice = ""
                 try:
                     executor = SQLQueryExecutor(
                         host=settings.db_host,
@@ -380,11 +482,29 @@ def main():
                         database=settings.db_name,
                         read_timeout=governance_limits.get("timeout_seconds", 30),
                     )
-                    result = executor.run(
-                        generated_sql,
-                        max_rows=governance_limits.get("max_rows", 1000),
+                    max_rows = governance_limits.get("max_rows", 1000)
+                    result = executor.run(generated_sql, max_rows=max_rows, params=query_params)
+                    empty_result_hint = ""
+                    if not result.rows:
+                        retried = _retry_with_data_time_bounds(
+                            enhanced_plan,
+                            generated_sql,
+                            query_params,
+                            semantic_layer,
+                            executor,
+                            max_rows,
+                        )
+                        if retried:
+                            enhanced_plan, generated_sql, query_params, result, empty_result_hint = retried
+
+                    # the LLM summary only needs the rows, so let it run while the chart is planned/rendered
+                    summary_future = background.submit(
+                        session.summarize_query_result_with_llm,
+                        user_input,
+                        result.rows,
+                        max_rows=20,
                     )
-
+                    zero_rows_notice = "[提醒] 查詢結果為 0 筆，當前條件下沒有可用數據。" if len(result.rows) == 0 else ""
                     preferred_chart_type = _detect_preferred_chart_type(features)
                     chart_spec = build_chart_spec(
                         result,
@@ -400,44 +520,47 @@ def main():
                         f"Step G SQL 執行筆數：{len(result.rows)}\n"
                         f"Step H 圖表規劃：{chart_spec}\n"
                         f"Step I 圖表輸出：{chart_path}"
+                        f"{empty_result_hint}"
                     )
-                    zero_rows_notice = "[提醒] 查詢結果為 0 筆，當前條件下沒有可用數據。" if len(result.rows) == 0 else ""
-                    try:
-                        summary_text = session.summarize_query_result_with_llm(user_input, result.rows, max_rows=20)
-                        summary_body = f"{zero_rows_notice}\n{summary_text}" if zero_rows_notice else summary_text
-                        summary_status = _dark_log_block(f"Step J 數據摘要：\n{summary_body}")
-                    except Exception as summary_exc:
-                        if zero_rows_notice:
-                            summary_status = f"Step J 數據摘要：\n{zero_rows_notice}\n（摘要生成失敗：{summary_exc}）"
-                        else:
-                            summary_status = f"Step J 數據摘要：略過（摘要生成失敗：{summary_exc}）"
                 except Exception as exc:
                     failure_message = str(exc) or "Step G/H/I 執行失敗"
                     chart_status = f"Step G/H/I 略過或失敗：{failure_message}"
-                    summary_text = session.summarize_failure_with_llm(user_input, failure_message)
-                    summary_status = _dark_log_block(f"Step J 數據摘要（錯誤修飾）：\n{summary_text}")
-
-            metrics_payload = {
-                "validation_ok": validation.get("ok", False),
-                "validation_error_codes": validation.get("error_codes", []),
-                "selected_metrics_count": len(enhanced_plan.get("selected_metrics", []) or []),
-                "selected_dimensions_count": len(enhanced_plan.get("selected_dimensions", []) or []),
-                "selected_filters_count": len(enhanced_plan.get("selected_filters", []) or []),
-                "compile_elapsed_ms": compile_ms,
-                "sql_generated": bool(generated_sql),
-            }
-
-            sql_text = generated_sql if generated_sql else "[尚未生成，請先修正校驗錯誤]"
-            print(
+                    # once rows are back the result summary is already running; only a failed query needs the error summary
+                    if summary_future is None:
+                        summary_text = session.summarize_failure_with_llm(user_input, failure_message)
+                        summary_status = _dark_log_block(f"Step J 數據摘要（錯誤修飾）：\n{summary_text}")
+                if summary_future is not None:
+                    summary_status = _await_result_summary(summary_future, zero_rows_notice)
+
+            metrics_payload = TurnMetrics(
+                validation_ok=validation.get("ok", False),
+                validation_error_codes=validation.get("error_codes", []),
+                selected_metrics_count=len(enhanced_plan.get("selected_metrics", []) or []),
+                selected_dimensions_count=len(enhanced_plan.get("selected_dimensions", []) or []),
+                selected_filters_count=len(enhanced_plan.get("selected_filters", []) or []),
+                compile_elapsed_ms=compile_ms,
+                sql_generated=bool(generated_sql),
+            )
+
+            sql_text = inline_sql_params(generated_sql, query_params) if generated_sql else "[尚未生成，請先修正校驗錯誤]"
+            logger.info(
                 "\n"
-                f"Step B 特徵提取結果：\n{_pretty(features)}\n"
-                f"Step C Token 命中結果：\n{_pretty(token_hits)}\n"
-                f"Step D 合併後計畫（Deterministic）：\n{_pretty(enhanced_plan)}\n"
-                f"Step E 規則校驗：\n{_pretty(validation)}\n"
-                f"Step F SQL 生成結果：\n{sql_text}\n"
-                f"Observability Metrics：\n{_pretty(metrics_payload)}\n"
-                f"{chart_status}\n"
-                f"{summary_status}\n"
+                "Step B 特徵提取結果：\n%s\n"
+                "Step C Token 命中結果：\n%s\n"
+                "Step D 合併後計畫（Deterministic）：\n%s\n"
+                "Step E 規則校驗：\n%s\n"
+                "Step F SQL 生成結果：\n%s\n"
+                "Observability Metrics：\n%s\n"
+                "%s\n"
+                "%s\n",
+                _LazyPretty(features),
+                _LazyPretty(token_hits),
+                _LazyPretty(enhanced_plan),
+                _LazyPretty(validation),
+                sql_text,
+                _LazyPretty(metrics_payload),
+                chart_status,
+                summary_status,
             )
             continue
 
@@ -450,5 +573,52 @@ def main():
         print(f"{_date_tag()}AI> {reply}\n")
 
 
+def main():
+    args = _parse_args()
+    load_dotenv()
+    _configure_logging()
+    settings = Settings.load()
+
+    if args.sql_file:
+        _run_sql_script_file(args.sql_file, settings)
+        return
+
+    # one pooled client keeps LLM / embedding / reranker connections alive across turns
+    http_client = httpx.Client(
+        timeout=60,
+        limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+    )
+    background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smartbi-bg")
+    try:
+        session = LLMChatSession(settings, http_client=http_client)
+        semantic_layer = load_semantic_layer()
+        governance_limits = get_governance(semantic_layer)
+        matcher = SemanticTokenMatcher(
+            "app/semantics/smartbi_demo_macau_banking_semantic.yaml",
+            embedding_base_url=settings.embedding_url,
+            embedding_model=settings.embedding_model,
+            embedding_api_key=settings.embedding_api_key,
+            reranker_base_url=settings.reranker_url,
+            reranker_model=settings.reranker_model,
+            reranker_api_key=settings.reranker_api_key,
+            reranker_score_threshold=settings.reranker_score_threshold,
+            http_client=http_client,
+        )
+
+        print_startup_ui(
+            model=settings.llm_model,
+            base_url=settings.llm_base_url,
+            version="1.0.0",
+            app_name="SmartBI Chat CLI",
+            framework="LangChain",
+            clear_screen=True,
+        )
+
+        _chat_loop(session, matcher, semantic_layer, governance_limits, settings, background)
+    finally:
+        background.shutdown(wait=False, cancel_futures=True)
+        http_client.close()
+
+
 if __name__ == "__main__":
     main()
@@ -1,8 +1,66 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import lru_cache
+import re
+import threading
+import time
 from typing import Any
 
+try:
+    import pymysql
+    from pymysql.cursors import SSDictCursor
+except ImportError:  # pragma: no cover - environment dependent
+    pymysql = None
+    SSDictCursor = None
+
+
+# quoted literals/identifiers are skipped; parentheses are tracked so only the outer LIMIT counts
+_LIMIT_SCAN_RE = re.compile(
+    r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|[()]|\blimit\s+\d+",
+    re.IGNORECASE,
+)
+_LEADING_SELECT_RE = re.compile(r"select\b", re.IGNORECASE)
+# one scan for both firewall rules: a leftover `;` (stacked statement) or a write keyword.
+# keywords are word-bounded so tabs/newlines around them are caught, while identifiers like created_at are not
+_BLOCKED_SQL_RE = re.compile(
+    r";|\b(?:insert|update|delete|drop|alter|create|truncate|grant|revoke)\b",
+    re.IGNORECASE,
+)
+# opening fence line, optional bare `sql` language line, body, closing fence line
+_CODE_FENCE_RE = re.compile(
+    r"\A```[^\n]*\n(?:(?:[ \t]*sql[ \t]*\n)?(?P<body>.*?)\n)?[^\n]*```\Z",
+    re.DOTALL | re.IGNORECASE,
+)
+
+# idle pymysql connections shared by every executor with the same connection settings
+_POOL_MAX_IDLE = 8
+_IDLE_CONNECTIONS: dict[tuple[Any, ...], list[Any]] = {}
+_POOL_LOCK = threading.Lock()
+_FETCH_CHUNK_SIZE = 256
+
+
+@lru_cache(maxsize=256)
+def _has_top_level_limit(sql: str) -> bool:
+    depth = 0
+    for match in _LIMIT_SCAN_RE.finditer(sql):
+        token = match.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and token[0] not in "'\"`":
+            return True
+    return False
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
 
 @dataclass(frozen=True)
 class QueryResult:
@@ -10,6 +68,47 @@ class QueryResult:
     rows: list[dict[str, Any]]
 
 
+# short-lived LRU of recent results so a repeated question skips the DB round-trip
+_RESULT_CACHE_TTL_SECONDS = 60.0
+_RESULT_CACHE_MAX_ENTRIES = 512
+_RESULT_CACHE: OrderedDict[tuple[Any, ...], tuple[float, QueryResult]] = OrderedDict()
+_RESULT_CACHE_LOCK = threading.Lock()
+
+# quoted literals are kept verbatim; only whitespace between tokens is collapsed
+_SQL_CACHE_TOKEN_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|\s+")
+
+
+def _normalize_sql_for_cache(sql: str) -> str:
+    collapsed = _SQL_CACHE_TOKEN_RE.sub(lambda m: m.group(0) if m.group(0)[0] in "'\"`" else " ", sql)
+    return collapsed.strip().rstrip(";").rstrip()
+
+
+def _copy_result(result: QueryResult) -> QueryResult:
+    # callers get their own rows, so mutating a result never leaks into later cache hits
+    return QueryResult(columns=list(result.columns), rows=[dict(row) for row in result.rows])
+
+
+def _get_cached_result(key: tuple[Any, ...]) -> QueryResult | None:
+    with _RESULT_CACHE_LOCK:
+        item = _RESULT_CACHE.get(key)
+        if item is None:
+            return None
+        expires_at, result = item
+        if expires_at < time.monotonic():
+            del _RESULT_CACHE[key]
+            return None
+        _RESULT_CACHE.move_to_end(key)
+        return result
+
+
+def _store_cached_result(key: tuple[Any, ...], result: QueryResult) -> None:
+    with _RESULT_CACHE_LOCK:
+        _RESULT_CACHE[key] = (time.monotonic() + _RESULT_CACHE_TTL_SECONDS, result)
+        _RESULT_CACHE.move_to_end(key)
+        while len(_RESULT_CACHE) > _RESULT_CACHE_MAX_ENTRIES:
+            _RESULT_CACHE.popitem(last=False)
+
+
 class SQLQueryExecutor:
     """Execute read-only SQL against MySQL using optional runtime dependency."""
 
@@ -31,6 +130,44 @@ class SQLQueryExecutor:
         self.connect_timeout = int(connect_timeout)
         self.read_timeout = int(read_timeout)
 
+    def _pool_key(self) -> tuple[Any, ...]:
+        return (self.host, self.port, self.user, self.database, self.connect_timeout, self.read_timeout)
+
+    def _acquire_connection(self) -> Any:
+        """Reuse an idle pooled connection when it still answers a ping, otherwise connect."""
+        key = self._pool_key()
+        while True:
+            with _POOL_LOCK:
+                idle = _IDLE_CONNECTIONS.get(key)
+                conn = idle.pop() if idle else None
+            if conn is None:
+                break
+            try:
+                conn.ping(reconnect=False)
+                return conn
+            except Exception:
+                _close_quietly(conn)
+
+        return pymysql.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            cursorclass=SSDictCursor,
+            autocommit=True,
+        )
+
+    def _release_connection(self, conn: Any) -> None:
+        with _POOL_LOCK:
+            idle = _IDLE_CONNECTIONS.setdefault(self._pool_key(), [])
+            if len(idle) < _POOL_MAX_IDLE:
+                idle.append(conn)
+                return
+        _close_quietly(conn)
+
     @staticmethod
     def _unwrap_common_llm_wrappers(sql: str) -> str:
         text = (sql or "").strip()
@@ -38,13 +175,9 @@ class SQLQueryExecutor:
             return ""
 
         # markdown code fences: ```sql ... ``` or ``` ... ```
-        if text.startswith("```") and text.endswith("```"):
-            lines = text.splitlines()
-            if len(lines) >= 2:
-                lines = lines[1:-1]
-                if lines and lines[0].strip().lower() == "sql":
-                    lines = lines[1:]
-                text = "\n".join(lines).strip()
+        fence_match = _CODE_FENCE_RE.match(text)
+        if fence_match:
+            text = (fence_match.group("body") or "").strip()
 
         # quoted string payload from upstream JSON / logging wrappers
         if len(text) >= 2 and text[0] == text[-1] and text[0] in ("\"", "'"):
@@ -66,17 +199,11 @@ class SQLQueryExecutor:
         if normalized.endswith(";"):
             normalized = normalized[:-1].rstrip()
 
-        # still contains semicolon means possible multi-statement
-        if ";" in normalized:
-            return None
-
-        lowered = normalized.lower()
-        if not lowered.startswith("select"):
+        if not _LEADING_SELECT_RE.match(normalized):
             return None
 
-        blocked = [" insert ", " update ", " delete ", " drop ", " alter ", " create "]
-        wrapped = f" {lowered} "
-        if any(token in wrapped for token in blocked):
+        # a remaining semicolon means a possible multi-statement; write keywords are never allowed
+        if _BLOCKED_SQL_RE.search(normalized):
             return None
 
         return normalized
@@ -98,40 +225,53 @@ class SQLQueryExecutor:
             )
         return message
 
-    def run(self, sql: str, max_rows: int = 1000) -> QueryResult:
+    def run(self, sql: str, max_rows: int = 1000, params: tuple[Any, ...] | None = None) -> QueryResult:
         normalized_sql = self._normalize_single_select_sql(sql)
         if not normalized_sql:
             raise ValueError("Only single SELECT queries are allowed.")
 
-        try:
-            import pymysql
-            from pymysql.cursors import DictCursor
-        except Exception as exc:  # pragma: no cover - environment dependent
-            raise RuntimeError("pymysql is required for SQL execution. Please install dependency.") from exc
-
         limited_sql = normalized_sql
-        if " limit " not in limited_sql.lower():
+        if not _has_top_level_limit(limited_sql):
             limited_sql = f"{limited_sql}\nLIMIT {int(max_rows)}"
 
+        # the user is part of the key: different MySQL accounts can see different rows for the same SQL
+        cache_key = (
+            self.host,
+            self.port,
+            self.user,
+            self.database,
+            int(max_rows),
+            _normalize_sql_for_cache(limited_sql),
+            tuple(params) if params is not None else None,
+        )
+        cached = _get_cached_result(cache_key)
+        if cached is not None:
+            return _copy_result(cached)
+
+        if pymysql is None:  # pragma: no cover - environment dependent
+            raise RuntimeError("pymysql is required for SQL execution. Please install dependency.")
+
         try:
-            conn = pymysql.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                connect_timeout=self.connect_timeout,
-                read_timeout=self.read_timeout,
-                cursorclass=DictCursor,
-                autocommit=True,
-            )
+            conn = self._acquire_connection()
             try:
+                # unbuffered cursor: rows are pulled in chunks, and fully drained so the connection can be pooled
                 with conn.cursor() as cursor:
-                    cursor.execute(limited_sql)
-                    rows = cursor.fetchall() or []
-                    columns = list(rows[0].keys()) if rows else []
-                    return QueryResult(columns=columns, rows=list(rows))
-            finally:
-                conn.close()
+                    # with params, pymysql escapes the values and expects `%%` for literal percent signs
+                    cursor.execute(limited_sql, params)
+                    columns = [d[0] for d in cursor.description or ()]
+                    rows: list[dict[str, Any]] = []
+                    while True:
+                        chunk = cursor.fetchmany(_FETCH_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        rows.extend(chunk)
+            except Exception:
+                # connection state is unknown after a failed statement; do not hand it back to the pool
+                _close_quietly(conn)
+                raise
+            self._release_connection(conn)
+            result = QueryResult(columns=columns, rows=rows)
+            _store_cached_result(cache_key, result)
+            return _copy_result(result)
         except Exception as exc:
             raise RuntimeError(self._rewrite_db_error_message(exc)) from exc
@@ -5,15 +5,32 @@ from typing import Any
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlSafeLoader
+except ImportError:  # pragma: no cover - PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlSafeLoader
+
 
 SEMANTIC_YAML_PATH = "app/semantics/smartbi_demo_macau_banking_semantic.yaml"
 
+# resolved path -> (st_mtime_ns, st_size, parsed semantic_layer)
+_SEMANTIC_LAYER_CACHE: dict[str, tuple[int, int, dict[str, Any]]] = {}
+
 
 def load_semantic_layer(path: str | Path = SEMANTIC_YAML_PATH) -> dict[str, Any]:
+    """Load the semantic layer, reusing the parsed dict until the file changes on disk."""
     semantic_path = Path(path)
+    stat = semantic_path.stat()
+    cache_key = str(semantic_path.resolve())
+    cached = _SEMANTIC_LAYER_CACHE.get(cache_key)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
     with semantic_path.open("r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
-    return data.get("semantic_layer", {})
+        data = yaml.load(f, Loader=_YamlSafeLoader) or {}
+    semantic_layer = data.get("semantic_layer", {})
+    _SEMANTIC_LAYER_CACHE[cache_key] = (stat.st_mtime_ns, stat.st_size, semantic_layer)
+    return semantic_layer
 
 
 def get_governance(semantic_layer: dict[str, Any]) -> dict[str, Any]:
@@ -1,6 +1,17 @@
 from __future__ import annotations
 
-from typing import Any
+from itertools import chain
+import sys
+from typing import Any, Callable
+
+
+# keyed by id(semantic_layer) (+ dataset name); layers are loaded once per process and treated as read-only
+_SEMANTIC_CACHE_MAX_ENTRIES = 32
+_CANONICAL_SETS_CACHE: dict[int, tuple[dict[str, Any], tuple[frozenset[str], frozenset[str]]]] = {}
+_COMPILABLE_NAMES_CACHE: dict[tuple[int, str], tuple[dict[str, Any], tuple[frozenset[str], frozenset[str]]]] = {}
+
+_COMPARATOR_OPS = frozenset({"=", "!=", ">", ">=", "<", "<="})
+
 
 
 def _parse_allowed_flag(value: Any, default: bool = False) -> bool:
@@ -18,10 +29,10 @@ def _parse_allowed_flag(value: Any, default: bool = False) -> bool:
 
 
 def _dataset_from_canonical_name(canonical_name: str) -> str | None:
-    if not isinstance(canonical_name, str) or "." not in canonical_name:
+    if not isinstance(canonical_name, str):
         return None
-    dataset, _ = canonical_name.split(".", 1)
-    return dataset or None
+    dataset, sep, _ = canonical_name.partition(".")
+    return dataset if sep and dataset else None
 
 
 def _collect_selected_datasets(
@@ -30,6 +41,7 @@ def _collect_selected_datasets(
 ) -> list[str]:
     candidates = enhanced_plan.get("selected_dataset_candidates", []) or []
     selected: list[str] = [c for c in candidates if isinstance(c, str) and c]
+    seen = set(selected)
 
     datasets = ((semantic_layer or {}).get("datasets", {}) or {})
     entities = ((semantic_layer or {}).get("entities", {}) or {})
@@ -45,35 +57,50 @@ def _collect_selected_datasets(
                 continue
             if datasets and dataset not in datasets:
                 continue
-            if dataset not in selected:
+            if dataset not in seen:
+                seen.add(dataset)
                 selected.append(dataset)
     return selected
 
 
 def _has_join_path(semantic_layer: dict[str, Any], selected_datasets: list[str]) -> bool:
     datasets = semantic_layer.get("datasets", {}) or {}
-    join_entities_sets: list[set[str]] = []
+    common_join_entities: set[str] | None = None
 
     for dataset_name in selected_datasets:
         dataset_def = datasets.get(dataset_name, {}) or {}
         joins = dataset_def.get("joins", []) or []
-        join_entities = {
-            j.get("entity")
-            for j in joins
-            if isinstance(j, dict) and isinstance(j.get("entity"), str) and j.get("entity")
-        }
+        join_entities = set(
+            entity
+            for entity in (j.get("entity") for j in joins if isinstance(j, dict))
+            if isinstance(entity, str) and entity
+        )
         if not join_entities:
             return False
-        join_entities_sets.append(join_entities)
+        if common_join_entities is None:
+            common_join_entities = join_entities
+        else:
+            common_join_entities &= join_entities
+            # no shared entity left; later datasets cannot restore one
+            if not common_join_entities:
+                return False
 
-    if not join_entities_sets:
-        return True
+    return True
 
-    common_join_entities = set.intersection(*join_entities_sets)
-    return bool(common_join_entities)
 
+def clear_semantic_caches() -> None:
+    """Drop cached semantic-layer indexes, e.g. after mutating a loaded layer in place."""
+    _CANONICAL_SETS_CACHE.clear()
+    _COMPILABLE_NAMES_CACHE.clear()
 
-def _build_valid_canonical_sets(semantic_layer: dict[str, Any]) -> tuple[set[str], set[str]]:
+
+def _build_valid_canonical_sets(semantic_layer: dict[str, Any]) -> tuple[frozenset[str], frozenset[str]]:
+    cached = _CANONICAL_SETS_CACHE.get(id(semantic_layer))
+    # identity check guards against a different layer that happens to get the same id
+    if cached is not None and cached[0] is semantic_layer:
+        return cached[1]
+
+    # interned so the validator and compiler indexes share one string object per canonical name
     metric_set: set[str] = set()
     dimension_set: set[str] = set()
 
@@ -84,50 +111,57 @@ def _build_valid_canonical_sets(semantic_layer: dict[str, Any]) -> tuple[set[str
         for metric in dataset.get("metrics", []) or []:
             name = str(metric.get("name", "") or "").strip()
             if name:
-                metric_set.add(f"{dataset_name}.{name}")
+                metric_set.add(sys.intern(f"{dataset_name}.{name}"))
         for dimension in dataset.get("dimensions", []) or []:
             name = str(dimension.get("name", "") or "").strip()
             if name:
-                dimension_set.add(f"{dataset_name}.{name}")
+                dimension_set.add(sys.intern(f"{dataset_name}.{name}"))
         for time_dimension in dataset.get("time_dimensions", []) or []:
             name = str(time_dimension.get("name", "") or "").strip()
             if name:
-                dimension_set.add(f"{dataset_name}.{name}")
+                dimension_set.add(sys.intern(f"{dataset_name}.{name}"))
 
     for entity_name, entity in entities.items():
         for field in entity.get("fields", []) or []:
             name = str(field.get("name", "") or "").strip()
             if name:
-                dimension_set.add(f"{entity_name}.{name}")
+                dimension_set.add(sys.intern(f"{entity_name}.{name}"))
         for sensitive_field in entity.get("sensitive_fields", []) or []:
             name = str(sensitive_field.get("name", "") or "").strip()
             if name and _parse_allowed_flag(sensitive_field.get("allowed", False), default=False):
-                dimension_set.add(f"{entity_name}.{name}")
+                dimension_set.add(sys.intern(f"{entity_name}.{name}"))
 
-    return metric_set, dimension_set
+    canonical_sets = (frozenset(metric_set), frozenset(dimension_set))
+    if len(_CANONICAL_SETS_CACHE) >= _SEMANTIC_CACHE_MAX_ENTRIES:
+        _CANONICAL_SETS_CACHE.clear()
+    _CANONICAL_SETS_CACHE[id(semantic_layer)] = (semantic_layer, canonical_sets)
+    return canonical_sets
 
 
-def _has_compilable_select_item(enhanced_plan: dict[str, Any], semantic_layer: dict[str, Any]) -> bool:
-    datasets = enhanced_plan.get("selected_dataset_candidates", []) or []
-    dataset_name = str(datasets[0]).strip() if datasets else ""
-    if not dataset_name:
-        return False
+def _build_compilable_name_sets(
+    dataset_name: str,
+    semantic_layer: dict[str, Any],
+) -> tuple[frozenset[str], frozenset[str]]:
+    cache_key = (id(semantic_layer), dataset_name)
+    cached = _COMPILABLE_NAMES_CACHE.get(cache_key)
+    if cached is not None and cached[0] is semantic_layer:
+        return cached[1]
 
     ds = (semantic_layer.get("datasets", {}) or {}).get(dataset_name, {}) or {}
     metric_names = {
-        f"{dataset_name}.{str(metric.get('name', '')).strip()}"
+        sys.intern(f"{dataset_name}.{str(metric.get('name', '')).strip()}")
         for metric in ds.get("metrics", []) or []
         if str(metric.get("name", "") or "").strip()
     }
     dimension_names = {
-        f"{dataset_name}.{str(dimension.get('name', '')).strip()}"
+        sys.intern(f"{dataset_name}.{str(dimension.get('name', '')).strip()}")
         for dimension in ds.get("dimensions", []) or []
         if str(dimension.get("name", "") or "").strip()
     }
     for time_dimension in ds.get("time_dimensions", []) or []:
         name = str(time_dimension.get("name", "") or "").strip()
         if name:
-            dimension_names.add(f"{dataset_name}.{name}")
+            dimension_names.add(sys.intern(f"{dataset_name}.{name}"))
 
     entities = semantic_layer.get("entities", {}) or {}
     for join in ds.get("joins", []) or []:
@@ -140,7 +174,54 @@ def _has_compilable_select_item(enhanced_plan: dict[str, Any], semantic_layer: d
         for sensitive_field in entity.get("sensitive_fields", []) or []:
             name = str(sensitive_field.get("name", "") or "").strip()
             if name and _parse_allowed_flag(sensitive_field.get("allowed", False), default=False):
-                dimension_names.add(f"{entity_name}.{name}")
+                dimension_names.add(sys.intern(f"{entity_name}.{name}"))
+
+    name_sets = (frozenset(metric_names), frozenset(dimension_names))
+    if len(_COMPILABLE_NAMES_CACHE) >= _SEMANTIC_CACHE_MAX_ENTRIES:
+        _COMPILABLE_NAMES_CACHE.clear()
+    _COMPILABLE_NAMES_CACHE[cache_key] = (semantic_layer, name_sets)
+    return name_sets
+
+
+def _check_between_shape(idx: int, value: Any) -> tuple[str, str] | None:
+    if type(value) is not list or len(value) != 2:
+        return ("INVALID_FILTER_BETWEEN", f"第 {idx+1} 個 between 條件必須提供兩個值。")
+    return None
+
+
+def _check_comparison_shape(idx: int, value: Any) -> tuple[str, str] | None:
+    if value is None:
+        return ("INVALID_FILTER_VALUE", f"第 {idx+1} 個過濾條件缺少 value。")
+    return None
+
+
+def _check_in_shape(idx: int, value: Any) -> tuple[str, str] | None:
+    if type(value) is not list or not value:
+        return ("INVALID_FILTER_VALUE", f"第 {idx+1} 個 in 條件需提供至少一個值。")
+    return None
+
+
+def _check_null_shape(idx: int, value: Any) -> tuple[str, str] | None:
+    return None
+
+
+# keyed by the normalized filter op; ops missing here must carry a raw `expr` instead
+_FILTER_SHAPE_CHECKS: dict[str, Callable[[int, Any], tuple[str, str] | None]] = {
+    "between": _check_between_shape,
+    "in": _check_in_shape,
+    "is null": _check_null_shape,
+    "is not null": _check_null_shape,
+    **{op: _check_comparison_shape for op in _COMPARATOR_OPS},
+}
+
+
+def _has_compilable_select_item(enhanced_plan: dict[str, Any], semantic_layer: dict[str, Any]) -> bool:
+    datasets = enhanced_plan.get("selected_dataset_candidates", []) or []
+    dataset_name = str(datasets[0]).strip() if datasets else ""
+    if not dataset_name:
+        return False
+
+    metric_names, dimension_names = _build_compilable_name_sets(dataset_name, semantic_layer)
 
     selected_metrics = [x for x in enhanced_plan.get("selected_metrics", []) or [] if isinstance(x, str)]
     selected_dimensions = [x for x in enhanced_plan.get("selected_dimensions", []) or [] if isinstance(x, str)]
@@ -160,10 +241,12 @@ def validate_semantic_plan(
 ) -> dict[str, Any]:
     errors: list[str] = []
     error_codes: list[str] = []
+    seen_error_codes: set[str] = set()
     blocked = token_hits.get("blocked_matches", []) or []
 
     def _add_error(code: str, message: str) -> None:
-        if code not in error_codes:
+        if code not in seen_error_codes:
+            seen_error_codes.add(code)
             error_codes.append(code)
         errors.append(message)
 
@@ -194,83 +277,87 @@ def validate_semantic_plan(
     if not selected_metrics and not selected_dimensions:
         _add_error("EMPTY_SELECTION", "尚未選到可用的指標/維度，請補充查詢條件。")
 
+    # every remaining check needs the semantic layer
+    if semantic_layer is None:
+        return {
+            "ok": len(errors) == 0,
+            "errors": errors,
+            "error_codes": error_codes,
+        }
+
     selected_datasets = _collect_selected_datasets(enhanced_plan, semantic_layer)
-    if len(selected_datasets) > 1 and semantic_layer is not None:
-        if not _has_join_path(semantic_layer, selected_datasets):
-            ds_list = ", ".join(selected_datasets)
-            _add_error(
-                "MULTI_DATASET_NO_JOIN_PATH",
-                f"多資料集無法透過共同維度連接（datasets: {ds_list}），請改用同一資料集的指標/維度。",
-            )
-
-    if semantic_layer is not None:
-        valid_metrics, valid_dimensions = _build_valid_canonical_sets(semantic_layer)
-        invalid_metrics = [m for m in selected_metrics if isinstance(m, str) and m not in valid_metrics]
-        invalid_dimensions = [d for d in selected_dimensions if isinstance(d, str) and d not in valid_dimensions]
-        invalid_filter_fields = []
-        for f in filters:
-            if not isinstance(f, dict):
-                continue
-            field = f.get("field")
-            if not isinstance(field, str):
-                continue
+    if len(selected_datasets) > 1 and not _has_join_path(semantic_layer, selected_datasets):
+        ds_list = ", ".join(selected_datasets)
+        _add_error(
+            "MULTI_DATASET_NO_JOIN_PATH",
+            f"多資料集無法透過共同維度連接（datasets: {ds_list}），請改用同一資料集的指標/維度。",
+        )
+
+    valid_metrics, valid_dimensions = _build_valid_canonical_sets(semantic_layer)
+    invalid_metrics = [m for m in selected_metrics if isinstance(m, str) and m not in valid_metrics]
+    invalid_dimensions = [d for d in selected_dimensions if isinstance(d, str) and d not in valid_dimensions]
+    invalid_filter_fields: list[str] = []
+    # shape errors are collected here and reported after the dataset checks to keep error order stable
+    filter_shape_errors: list[tuple[str, str]] = []
+    for idx, f in enumerate(filters):
+        if type(f) is not dict:
+            filter_shape_errors.append(("INVALID_FILTER_SHAPE", f"第 {idx+1} 個過濾條件格式錯誤，需為物件。"))
+            continue
+
+        field = f.get("field")
+        if isinstance(field, str):
             normalized_field = field.strip()
-            if not normalized_field or "." not in normalized_field:
-                continue
-            if normalized_field not in valid_dimensions:
+            if normalized_field and "." in normalized_field and normalized_field not in valid_dimensions:
                 invalid_filter_fields.append(normalized_field)
 
-        if invalid_metrics or invalid_dimensions or invalid_filter_fields:
-            invalid_text = ", ".join(invalid_metrics + invalid_dimensions + invalid_filter_fields)
-            _add_error("INVALID_CANONICAL_REF", f"選取了語意層不存在的欄位：{invalid_text}")
-
-        first_dataset = ""
-        datasets = enhanced_plan.get("selected_dataset_candidates", []) or []
-        if datasets and isinstance(datasets[0], str):
-            first_dataset = datasets[0]
-        if first_dataset:
-            entities = semantic_layer.get("entities", {}) or {}
-            foreign_metrics = [
-                m
-                for m in selected_metrics
-                if isinstance(m, str)
-                and "." in m
-                and m.split(".", 1)[0] != first_dataset
-            ]
-            foreign_dimensions = [
-                d
-                for d in selected_dimensions
-                if isinstance(d, str)
-                and "." in d
-                and d.split(".", 1)[0] != first_dataset
-                and d.split(".", 1)[0] not in entities
-            ]
-            if foreign_metrics or foreign_dimensions:
-                _add_error("DATASET_MISMATCH", "已選欄位與 selected_dataset_candidates[0] 不一致，請改用同一資料集。")
-
-        for idx, f in enumerate(filters):
-            if not isinstance(f, dict):
-                _add_error("INVALID_FILTER_SHAPE", f"第 {idx+1} 個過濾條件格式錯誤，需為物件。")
+        op = str(f.get("op", "") or "").strip().lower()
+        check = _FILTER_SHAPE_CHECKS.get(op)
+        if check is not None:
+            shape_error = check(idx, f.get("value"))
+            if shape_error is not None:
+                filter_shape_errors.append(shape_error)
+        else:
+            expr = f.get("expr")
+            if not (isinstance(expr, str) and expr.strip()):
+                filter_shape_errors.append(
+                    ("INVALID_FILTER_SHAPE", f"第 {idx+1} 個過濾條件缺少可用欄位（field/op/value 或 expr）。")
+                )
+
+    if invalid_metrics or invalid_dimensions or invalid_filter_fields:
+        invalid_text = ", ".join(chain(invalid_metrics, invalid_dimensions, invalid_filter_fields))
+        _add_error("INVALID_CANONICAL_REF", f"選取了語意層不存在的欄位：{invalid_text}")
+
+    first_dataset = ""
+    datasets = enhanced_plan.get("selected_dataset_candidates", []) or []
+    if datasets and isinstance(datasets[0], str):
+        first_dataset = datasets[0]
+    # nothing selected means nothing can belong to another dataset
+    if first_dataset and (selected_metrics or selected_dimensions):
+        entities = semantic_layer.get("entities", {}) or {}
+        has_foreign_ref = False
+        for m in selected_metrics:
+            if not isinstance(m, str):
                 continue
-            op = str(f.get("op", "") or "").strip().lower()
-            value = f.get("value")
-            has_expr = isinstance(f.get("expr"), str) and bool(f.get("expr", "").strip())
-            if op == "between":
-                if not isinstance(value, list) or len(value) != 2:
-                    _add_error("INVALID_FILTER_BETWEEN", f"第 {idx+1} 個 between 條件必須提供兩個值。")
-            elif op in {"=", "!=", ">", ">=", "<", "<="}:
-                if value is None:
-                    _add_error("INVALID_FILTER_VALUE", f"第 {idx+1} 個過濾條件缺少 value。")
-            elif op == "in":
-                if not isinstance(value, list) or not value:
-                    _add_error("INVALID_FILTER_VALUE", f"第 {idx+1} 個 in 條件需提供至少一個值。")
-            elif op in {"is null", "is not null"}:
-                pass
-            elif not has_expr:
-                _add_error("INVALID_FILTER_SHAPE", f"第 {idx+1} 個過濾條件缺少可用欄位（field/op/value 或 expr）。")
-
-        if not _has_compilable_select_item(enhanced_plan, semantic_layer):
-            _add_error("NO_COMPILABLE_SELECT", "目前選取內容無法編譯成有效 SELECT，請改選同資料集內的指標/維度。")
+            prefix, sep, _ = m.partition(".")
+            if sep and prefix != first_dataset:
+                has_foreign_ref = True
+                break
+        if not has_foreign_ref:
+            for d in selected_dimensions:
+                if not isinstance(d, str):
+                    continue
+                prefix, sep, _ = d.partition(".")
+                if sep and prefix != first_dataset and prefix not in entities:
+                    has_foreign_ref = True
+                    break
+        if has_foreign_ref:
+            _add_error("DATASET_MISMATCH", "已選欄位與 selected_dataset_candidates[0] 不一致，請改用同一資料集。")
+
+    for code, message in filter_shape_errors:
+        _add_error(code, message)
+
+    if not _has_compilable_select_item(enhanced_plan, semantic_layer):
+        _add_error("NO_COMPILABLE_SELECT", "目前選取內容無法編譯成有效 SELECT，請改選同資料集內的指標/維度。")
 
     return {
         "ok": len(errors) == 0,
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any
+from itertools import chain
+import re
+import sys
+from typing import Any, Callable
 
 
 def _parse_allowed_flag(value: Any, default: bool = False) -> bool:
@@ -17,7 +21,7 @@ def _parse_allowed_flag(value: Any, default: bool = False) -> bool:
     return default
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SemanticLookup:
     dataset_name: str
     metric_expr_by_name: dict[str, str]
@@ -29,9 +33,25 @@ class SemanticLookup:
     join_clauses: list[tuple[str, str]]
     calendar_table: str
     calendar_join_on: str
+    # SELECT alias for every canonical name above, e.g. sales.revenue -> sales_revenue
+    alias_by_canonical: dict[str, str]
+
+
+# keyed by (id(semantic_layer), dataset_name); layers are treated as read-only once loaded.
+# LRU order lets lookups for a layer replaced by a YAML reload age out instead of flushing everything.
+_SEMANTIC_CACHE_MAX_ENTRIES = 64
+_LOOKUP_CACHE: OrderedDict[tuple[int, str], tuple[dict[str, Any], SemanticLookup]] = OrderedDict()
+
+_COMPARATOR_OPS = frozenset({"=", "!=", ">", ">=", "<", "<="})
+# aggregates coalesced to 0 on calendar days without fact rows
+_ZERO_FILL_METRIC_TYPES = frozenset({"sum", "avg", "count", "count_distinct"})
 
 
 def _quote_sql_value(value: Any) -> str:
+    # plain strings are the common case; check them first and skip the str() call
+    if value.__class__ is str:
+        text = value.replace("'", "''")
+        return f"'{text}'"
     if value is None:
         return "NULL"
     if isinstance(value, (int, float)):
@@ -40,60 +60,113 @@ def _quote_sql_value(value: Any) -> str:
     return f"'{text}'"
 
 
+# marks a bound value while the template is assembled; it cannot occur in semantic-layer SQL text
+_PARAM_SLOT = "\x00"
+_PYFORMAT_TOKEN_RE = re.compile(r"%%|%s")
+_PLAIN_PARAM_TYPES = frozenset({str, int, float, type(None)})
+
+
+def _bind_value(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def inline_sql_params(sql: str, params: tuple[Any, ...]) -> str:
+    """Render a `%s` template with quoted literals, for display and logging only."""
+    values = iter(params)
+    return _PYFORMAT_TOKEN_RE.sub(
+        lambda m: "%" if m.group(0) == "%%" else _quote_sql_value(next(values)),
+        sql,
+    )
+
+
+def clear_semantic_caches() -> None:
+    """Drop cached semantic-layer lookups, e.g. after mutating a loaded layer in place."""
+    _LOOKUP_CACHE.clear()
+
+
 def _build_semantic_lookup(dataset_name: str, semantic_layer: dict[str, Any]) -> SemanticLookup:
+    cache_key = (id(semantic_layer), dataset_name)
+    cached = _LOOKUP_CACHE.get(cache_key)
+    # entries keep their layer alive, so the `is` check rules out a recycled id
+    if cached is not None and cached[0] is semantic_layer:
+        _LOOKUP_CACHE.move_to_end(cache_key)
+        return cached[1]
+
+    lookup = _build_semantic_lookup_uncached(dataset_name, semantic_layer)
+    _LOOKUP_CACHE[cache_key] = (semantic_layer, lookup)
+    _LOOKUP_CACHE.move_to_end(cache_key)
+    while len(_LOOKUP_CACHE) > _SEMANTIC_CACHE_MAX_ENTRIES:
+        _LOOKUP_CACHE.popitem(last=False)
+    return lookup
+
+
+def _stripped(item: dict[str, Any], key: str) -> str:
+    value = item.get(key)
+    if type(value) is str:
+        return value.strip()
+    return str(value).strip() if value else ""
+
+
+def _build_semantic_lookup_uncached(dataset_name: str, semantic_layer: dict[str, Any]) -> SemanticLookup:
     datasets = semantic_layer.get("datasets", {}) or {}
     entities = semantic_layer.get("entities", {}) or {}
     dataset = datasets.get(dataset_name, {}) or {}
 
     metric_expr_by_name: dict[str, str] = {}
     metric_type_by_name: dict[str, str] = {}
-    for metric in dataset.get("metrics", []) or []:
-        canonical = f"{dataset_name}.{metric.get('name', '')}"
-        expr = str(metric.get("expr", "") or "").strip()
-        metric_type = str(metric.get("type", "") or "").strip().lower()
-        if canonical and expr:
-            metric_expr_by_name[canonical] = expr
-            metric_type_by_name[canonical] = metric_type
+    for metric in dataset.get("metrics") or ():
+        name = metric.get("name")
+        if not name:
+            continue
+        expr = _stripped(metric, "expr")
+        if not expr:
+            continue
+        canonical = sys.intern(f"{dataset_name}.{name}")
+        metric_expr_by_name[canonical] = expr
+        metric_type_by_name[canonical] = _stripped(metric, "type").lower()
 
     dimension_expr_by_name: dict[str, str] = {}
-    for dimension in dataset.get("dimensions", []) or []:
-        canonical = f"{dataset_name}.{dimension.get('name', '')}"
-        expr = str(dimension.get("expr", "") or "").strip()
-        if canonical and expr:
-            dimension_expr_by_name[canonical] = expr
-
-    for time_dimension in dataset.get("time_dimensions", []) or []:
-        canonical = f"{dataset_name}.{time_dimension.get('name', '')}"
-        expr = str(time_dimension.get("expr", "") or "").strip()
-        if canonical and expr:
-            dimension_expr_by_name[canonical] = expr
+    for dimension in dataset.get("dimensions") or ():
+        name = dimension.get("name")
+        if not name:
+            continue
+        expr = _stripped(dimension, "expr")
+        if expr:
+            dimension_expr_by_name[sys.intern(f"{dataset_name}.{name}")] = expr
 
     first_time_name = ""
     first_time_expr = ""
-    for time_dimension in dataset.get("time_dimensions", []) or []:
-        name = str(time_dimension.get("name", "") or "").strip()
-        expr = str(time_dimension.get("expr", "") or "").strip()
-        if expr:
-            first_time_name = name
+    for time_dimension in dataset.get("time_dimensions") or ():
+        expr = _stripped(time_dimension, "expr")
+        if not expr:
+            continue
+        name = time_dimension.get("name")
+        if not first_time_expr:
+            first_time_name = str(name or "").strip()
             first_time_expr = expr
-            break
+        if name:
+            dimension_expr_by_name[sys.intern(f"{dataset_name}.{name}")] = expr
 
     for entity_name, entity in entities.items():
-        for field in entity.get("fields", []) or []:
-            canonical = f"{entity_name}.{field.get('name', '')}"
-            expr = str(field.get("expr", "") or "").strip()
-            if canonical and expr:
-                dimension_expr_by_name[canonical] = expr
-        for sensitive_field in entity.get("sensitive_fields", []) or []:
-            if not _parse_allowed_flag(sensitive_field.get("allowed", False), default=False):
+        for field in entity.get("fields") or ():
+            name = field.get("name")
+            if not name:
+                continue
+            expr = _stripped(field, "expr")
+            if expr:
+                dimension_expr_by_name[sys.intern(f"{entity_name}.{name}")] = expr
+        for sensitive_field in entity.get("sensitive_fields") or ():
+            name = sensitive_field.get("name")
+            if not name or not _parse_allowed_flag(sensitive_field.get("allowed", False), default=False):
                 continue
-            canonical = f"{entity_name}.{sensitive_field.get('name', '')}"
-            expr = str(sensitive_field.get("expr", "") or "").strip()
-            if canonical and expr:
-                dimension_expr_by_name[canonical] = expr
+            expr = _stripped(sensitive_field, "expr")
+            if expr:
+                dimension_expr_by_name[sys.intern(f"{entity_name}.{name}")] = expr
 
     join_clauses: list[tuple[str, str]] = []
-    calendar_table = str((((semantic_layer.get("entities", {}) or {}).get("calendar", {}) or {}).get("table", "") or "")).strip()
+    calendar_table = _stripped(entities.get("calendar", {}) or {}, "table")
     calendar_join_on = ""
     for join in dataset.get("joins", []) or []:
         entity_name = join.get("entity")
@@ -105,7 +178,7 @@ def _build_semantic_lookup(dataset_name: str, semantic_layer: dict[str, Any]) ->
         if not entity_name or not on_clause:
             continue
         entity = entities.get(entity_name, {}) or {}
-        table = str(entity.get("table", "") or "").strip()
+        table = _stripped(entity, "table")
         if not table:
             continue
         join_clauses.append((str(entity_name), f"LEFT JOIN {table} ON {on_clause}"))
@@ -116,9 +189,9 @@ def _build_semantic_lookup(dataset_name: str, semantic_layer: dict[str, Any]) ->
         calendar_expr = ""
         calendar_entity = entities.get("calendar", {}) or {}
         for field in calendar_entity.get("fields", []) or []:
-            if str(field.get("name", "") or "").strip() != first_time_name:
+            if _stripped(field, "name") != first_time_name:
                 continue
-            calendar_expr = str(field.get("expr", "") or "").strip()
+            calendar_expr = _stripped(field, "expr")
             if calendar_expr:
                 break
         if calendar_expr and calendar_expr != first_time_expr:
@@ -134,10 +207,14 @@ def _build_semantic_lookup(dataset_name: str, semantic_layer: dict[str, Any]) ->
         dimension_expr_by_name=dimension_expr_by_name,
         first_time_name=first_time_name,
         first_time_expr=first_time_expr,
-        from_clause=str(dataset.get("from", "") or "").strip(),
+        from_clause=_stripped(dataset, "from"),
         join_clauses=join_clauses,
         calendar_table=calendar_table,
         calendar_join_on=calendar_join_on,
+        alias_by_canonical={
+            canonical: canonical.replace(".", "_")
+            for canonical in chain(metric_expr_by_name, dimension_expr_by_name)
+        },
     )
 
 
@@ -164,10 +241,57 @@ def _should_use_calendar_skeleton(lookup: SemanticLookup, group_by_parts: list[s
     return lookup.first_time_expr in group_by_parts
 
 
+def _build_between_filter(field_expr: str, op: str, value: Any, params: list[Any]) -> str | None:
+    if type(value) is not list or len(value) != 2:
+        return None
+    params.append(_bind_value(value[0]))
+    params.append(_bind_value(value[1]))
+    return f"{field_expr} BETWEEN {_PARAM_SLOT} AND {_PARAM_SLOT}"
+
+
+def _build_comparison_filter(field_expr: str, op: str, value: Any, params: list[Any]) -> str | None:
+    params.append(_bind_value(value))
+    return f"{field_expr} {op} {_PARAM_SLOT}"
+
+
+def _build_in_filter(field_expr: str, op: str, value: Any, params: list[Any]) -> str | None:
+    if type(value) is not list or not value:
+        return None
+    # long IN lists are usually all plain strings/numbers; type-check them in C and bind as-is
+    if _PLAIN_PARAM_TYPES.issuperset(map(type, value)):
+        params.extend(value)
+    else:
+        params.extend(_bind_value(v) for v in value)
+    value_sql = ", ".join([_PARAM_SLOT] * len(value))
+    return f"{field_expr} IN ({value_sql})"
+
+
+def _build_null_filter(field_expr: str, op: str, value: Any, params: list[Any]) -> str | None:
+    return f"{field_expr} {op.upper()}"
+
+
+# keyed by the normalized (lower-case) filter op; a None result falls back to the filter's raw `expr`
+_FILTER_BUILDERS: dict[str, Callable[[str, str, Any, list[Any]], str | None]] = {
+    "between": _build_between_filter,
+    "in": _build_in_filter,
+    "is null": _build_null_filter,
+    "is not null": _build_null_filter,
+    **{op: _build_comparison_filter for op in _COMPARATOR_OPS},
+}
+
+
 def compile_sql_from_semantic_plan(
     enhanced_plan: dict[str, Any],
     semantic_layer: dict[str, Any],
 ) -> str:
+    return inline_sql_params(*compile_parameterized_sql_from_semantic_plan(enhanced_plan, semantic_layer))
+
+
+def compile_parameterized_sql_from_semantic_plan(
+    enhanced_plan: dict[str, Any],
+    semantic_layer: dict[str, Any],
+) -> tuple[str, tuple[Any, ...]]:
+    """Compile to a pymysql `%s` template plus its filter values, in placeholder order."""
     datasets = enhanced_plan.get("selected_dataset_candidates", []) or []
     if not datasets:
         raise ValueError("No dataset candidates available for SQL compilation.")
@@ -177,29 +301,32 @@ def compile_sql_from_semantic_plan(
     if not lookup.from_clause:
         raise ValueError(f"Dataset '{dataset_name}' has no from clause.")
 
-    select_parts: list[str] = []
-    group_by_parts: list[str] = []
-
-    for canonical in enhanced_plan.get("selected_dimensions", []) or []:
-        expr = lookup.dimension_expr_by_name.get(canonical)
-        if not expr:
-            continue
-        alias = canonical.replace(".", "_")
-        select_parts.append(f"{expr} AS {alias}")
-        group_by_parts.append(expr)
+    dimension_expr_by_name = lookup.dimension_expr_by_name
+    metric_expr_by_name = lookup.metric_expr_by_name
+    metric_type_by_name = lookup.metric_type_by_name
+    alias_by_canonical = lookup.alias_by_canonical
+
+    # the lookup only stores non-empty expressions, so membership alone decides validity
+    known_dimensions = [
+        (canonical, dimension_expr_by_name[canonical])
+        for canonical in enhanced_plan.get("selected_dimensions", []) or []
+        if canonical in dimension_expr_by_name
+    ]
+    select_parts = [f"{expr} AS {alias_by_canonical[canonical]}" for canonical, expr in known_dimensions]
+    group_by_parts = [expr for _, expr in known_dimensions]
+    select_append = select_parts.append
 
     use_calendar_skeleton = _should_use_calendar_skeleton(lookup, group_by_parts)
 
     for canonical in enhanced_plan.get("selected_metrics", []) or []:
-        expr = lookup.metric_expr_by_name.get(canonical)
+        expr = metric_expr_by_name.get(canonical)
         if not expr:
             continue
-        metric_type = lookup.metric_type_by_name.get(canonical, "")
+        metric_type = metric_type_by_name.get(canonical, "")
         metric_expr = _normalize_metric_expr(expr, metric_type)
-        if use_calendar_skeleton and metric_type in {"sum", "avg", "count", "count_distinct"}:
+        if use_calendar_skeleton and metric_type in _ZERO_FILL_METRIC_TYPES:
             metric_expr = f"COALESCE({metric_expr}, 0)"
-        alias = canonical.replace(".", "_")
-        select_parts.append(f"{metric_expr} AS {alias}")
+        select_append(f"{metric_expr} AS {alias_by_canonical[canonical]}")
 
     if use_calendar_skeleton and lookup.first_time_expr:
         select_parts.append(
@@ -210,46 +337,58 @@ def compile_sql_from_semantic_plan(
         raise ValueError("No valid dimensions/metrics found for SELECT clause.")
 
     where_parts: list[str] = []
+    params: list[Any] = []
     for f in enhanced_plan.get("selected_filters", []) or []:
-        if not isinstance(f, dict):
+        if type(f) is not dict:
             continue
         field = str(f.get("field", "") or "").strip()
         op = str(f.get("op", "") or "").strip().lower()
         value = f.get("value")
-        field_expr = lookup.dimension_expr_by_name.get(field, field)
-
-        if op == "between" and isinstance(value, list) and len(value) == 2:
-            where_parts.append(
-                f"{field_expr} BETWEEN {_quote_sql_value(value[0])} AND {_quote_sql_value(value[1])}"
-            )
-        elif op in {"=", "!=", ">", ">=", "<", "<="}:
-            where_parts.append(f"{field_expr} {op} {_quote_sql_value(value)}")
-        elif op == "in" and isinstance(value, list) and value:
-            value_sql = ", ".join(_quote_sql_value(v) for v in value)
-            where_parts.append(f"{field_expr} IN ({value_sql})")
-        elif op == "is null":
-            where_parts.append(f"{field_expr} IS NULL")
-        elif op == "is not null":
-            where_parts.append(f"{field_expr} IS NOT NULL")
+        field_expr = dimension_expr_by_name.get(field, field)
+
+        builder = _FILTER_BUILDERS.get(op)
+        part = builder(field_expr, op, value, params) if builder is not None else None
+        if part:
+            where_parts.append(part)
         elif isinstance(f.get("expr"), str) and f["expr"].strip():
             where_parts.append(f["expr"].strip())
 
-    sql_lines = [f"SELECT {', '.join(select_parts)}"]
     if use_calendar_skeleton:
-        sql_lines.append(f"FROM {lookup.calendar_table}")
-        sql_lines.append(f"LEFT JOIN {lookup.from_clause} ON {lookup.calendar_join_on}")
-        for entity_name, join_clause in lookup.join_clauses:
-            if entity_name == "calendar":
-                continue
-            sql_lines.append(join_clause)
+        sql_lines = [
+            f"SELECT {', '.join(select_parts)}",
+            f"FROM {lookup.calendar_table}",
+            f"LEFT JOIN {lookup.from_clause} ON {lookup.calendar_join_on}",
+            *[join_clause for entity_name, join_clause in lookup.join_clauses if entity_name != "calendar"],
+        ]
     else:
-        sql_lines.append(f"FROM {lookup.from_clause}")
-        sql_lines.extend(join_clause for _, join_clause in lookup.join_clauses)
-
+        sql_lines = [
+            f"SELECT {', '.join(select_parts)}",
+            f"FROM {lookup.from_clause}",
+            *[join_clause for _, join_clause in lookup.join_clauses],
+        ]
     if where_parts:
         sql_lines.append(f"WHERE {' AND '.join(where_parts)}")
-
     if group_by_parts:
         sql_lines.append(f"GROUP BY {', '.join(group_by_parts)}")
 
-    return "\n".join(sql_lines)
+    # literal `%` in expressions (e.g. DATE_FORMAT patterns) must survive pymysql's `%` formatting
+    template = "\n".join(sql_lines).replace("%", "%%").replace(_PARAM_SLOT, "%s")
+    return template, tuple(params)
+
+
+def rebind_between_params(
+    params: tuple[Any, ...],
+    old_range: tuple[Any, Any],
+    new_range: tuple[Any, Any],
+) -> tuple[Any, ...] | None:
+    """Swap the bound values of one BETWEEN filter; the compiled template is unchanged.
+
+    Returns None when the old range is not bound exactly once, so callers can
+    fall back to `compile_parameterized_sql_from_semantic_plan`.
+    """
+    old_pair = (_bind_value(old_range[0]), _bind_value(old_range[1]))
+    hits = [idx for idx in range(len(params) - 1) if params[idx : idx + 2] == old_pair]
+    if len(hits) != 1:
+        return None
+    idx = hits[0]
+    return (*params[:idx], _bind_value(new_range[0]), _bind_value(new_range[1]), *params[idx + 2 :])
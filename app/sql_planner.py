@@ -1,20 +1,29 @@
 from __future__ import annotations
 
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
 import re
-from typing import Any
-
-
-_NUMERIC_PATTERN = re.compile(r"^-?\d+(?:\.\d+)?$")
-
-
-def _unique_keep_order(values: list[str]) -> list[str]:
-    seen: set[str] = set()
-    out: list[str] = []
-    for v in values:
-        if v not in seen:
-            seen.add(v)
-            out.append(v)
-    return out
+import sys
+from typing import Any, Callable
+
+
+# used with fullmatch on already-stripped text, so no ^/$ anchors are needed
+# between/in shapes in one alternation: a single fullmatch instead of one attempt per shape
+_RANGE_FILTER_PATTERN = re.compile(
+    r"(?P<between_field>.+?)\s+between\s+(?P<start>.+?)\s+and\s+(?P<end>.+)"
+    r"|(?P<in_field>.+?)\s+in\s*\((?P<values>.+)\)",
+    re.IGNORECASE,
+)
+_COMPARISON_OP_PATTERN = re.compile(r"!=|>=|<=|=|>|<")
+_COMPARISON_OP_PRIORITY = {op: idx for idx, op in enumerate(("!=", ">=", "<=", "=", ">", "<"))}
+_DPD_SHORTCUT_PATTERN = re.compile(r"dpd\s*(\d+)", re.IGNORECASE)
+_MONTH_BOUND_PATTERN = re.compile(r"\d{4}-\d{2}(?:-\d{2})?")
+_YEAR_MONTH_TOKEN_PATTERN = re.compile(r"(\d{4})[-年/](\d{2}|\d)")
+_PHRASE_SUFFIX_TOKENS = ("總額", "總和", "合計", "總計")
+_MONTH_CONFLICT_OPS = frozenset({"=", "between", "in"})
+# every filter parsed from Step B text carries this one shared source string
+_STEP_B_FILTER_SOURCE = "step_b_filters"
 
 
 def _normalize_key(value: str) -> str:
@@ -23,106 +32,132 @@ def _normalize_key(value: str) -> str:
 
 def _normalize_phrase(value: str) -> str:
     text = _normalize_key(value).replace(" ", "")
-    for token in ("總額", "總和", "合計", "總計"):
+    # every suffix token contains 總 or 合; most names have neither, so skip the four scans
+    if "總" not in text and "合" not in text:
+        return text
+    # replaced one after another on purpose: removing one token can expose another (合總額計 -> 合計 -> "")
+    for token in _PHRASE_SUFFIX_TOKENS:
         text = text.replace(token, "")
     return text
 
 
-def _canonical_candidates(matches: list[dict[str, Any]], object_type: str) -> list[str]:
-    return _unique_keep_order(
-        [
-            m.get("canonical_name", "")
-            for m in matches
-            if m.get("object_type") == object_type and m.get("allowed") is not False and m.get("canonical_name")
-        ]
-    )
+# alias lookups keyed by (id(semantic_layer), dataset_name); the cached entry pins its layer so the id stays unique
+_SEMANTIC_CACHE_MAX_ENTRIES = 32
+_ALIAS_LOOKUP_CACHE: dict[tuple[int, str], tuple[dict[str, Any], dict[str, str]]] = {}
+_METRIC_PHRASE_INDEX_CACHE: dict[int, tuple[dict[str, Any], _MetricPhraseIndex]] = {}
+_TIME_DIM_CACHE: dict[tuple[int, str], tuple[dict[str, Any], tuple[str, str]]] = {}
 
+_DIMENSION_OBJECT_TYPES = frozenset({"dimension", "field", "sensitive_field"})
 
-def _dimension_candidates(matches: list[dict[str, Any]]) -> list[str]:
-    return _unique_keep_order(
-        [
-            m.get("canonical_name", "")
-            for m in matches
-            if m.get("object_type") in {"dimension", "field", "sensitive_field"}
-            and m.get("allowed") is not False
-            and m.get("canonical_name")
-        ]
-    )
 
+def _intern_name(value: Any) -> Any:
+    # share one object with the validator/compiler indexes, which intern the same canonical names
+    return sys.intern(value) if type(value) is str else value
 
-def _dataset_candidates(matches: list[dict[str, Any]]) -> list[str]:
-    return _unique_keep_order([m.get("dataset", "") for m in matches if m.get("dataset")])
 
-
-def _safe_selected_values(candidates: list[str], values: list[Any]) -> list[str]:
-    candidate_set = set(candidates)
-    out: list[str] = []
-    for value in values:
-        if not isinstance(value, str):
-            continue
-        normalized = value.strip()
-        if not normalized or normalized not in candidate_set:
-            continue
-        if normalized not in out:
-            out.append(normalized)
-    return out
+def _partition_candidates(matches: list[dict[str, Any]]) -> tuple[list[str], list[str], list[str]]:
+    """Split Step C matches into (metrics, dimensions, datasets), each deduplicated in match order."""
+    metrics: dict[str, None] = {}
+    dimensions: dict[str, None] = {}
+    datasets: dict[str, None] = {}
+    for m in matches:
+        canonical_name = m.get("canonical_name")
+        if canonical_name and m.get("allowed") is not False:
+            object_type = m.get("object_type")
+            if object_type == "metric":
+                metrics[_intern_name(canonical_name)] = None
+            elif object_type in _DIMENSION_OBJECT_TYPES:
+                dimensions[_intern_name(canonical_name)] = None
+        dataset = m.get("dataset")
+        if dataset:
+            datasets[dataset] = None
+    return list(metrics), list(dimensions), list(datasets)
 
 
 def _parse_scalar_filter_value(raw_value: str) -> Any:
     value = raw_value.strip()
     if len(value) >= 2 and ((value[0] == value[-1] == "'") or (value[0] == value[-1] == '"')):
         return value[1:-1]
-    if _NUMERIC_PATTERN.match(value):
-        return float(value) if "." in value else int(value)
+    # same shape as -?\d+(?:\.\d+)? without a regex call; isdecimal covers exactly the \d digits
+    head, dot, tail = (value[1:] if value[:1] == "-" else value).partition(".")
+    if head.isdecimal() and (not dot or tail.isdecimal()):
+        return float(value) if dot else int(value)
     return value
 
 
 def _parse_filter_expr(filter_text: str) -> dict[str, Any]:
+    # LLM filter strings repeat across questions; parse each distinct text once
+    parsed = _parse_filter_expr_cached(filter_text)
+    # callers own the result (field normalization writes into it), so never hand out the cached dict or its value list
+    out = dict(parsed)
+    value = out.get("value")
+    if type(value) is list:
+        out["value"] = list(value)
+    return out
+
+
+def _between_filter_from_match(match: re.Match[str]) -> dict[str, Any]:
+    return {
+        "field": match.group("between_field").strip(),
+        "op": "between",
+        "value": [
+            _parse_scalar_filter_value(match.group("start")),
+            _parse_scalar_filter_value(match.group("end")),
+        ],
+        "source": _STEP_B_FILTER_SOURCE,
+    }
+
+
+def _in_filter_from_match(match: re.Match[str]) -> dict[str, Any]:
+    raw_values = [v.strip() for v in match.group("values").split(",")]
+    return {
+        "field": match.group("in_field").strip(),
+        "op": "in",
+        "value": [_parse_scalar_filter_value(v) for v in raw_values if v],
+        "source": _STEP_B_FILTER_SOURCE,
+    }
+
+
+# keyed by the final named group of each _RANGE_FILTER_PATTERN alternative
+_RANGE_FILTER_HANDLERS: dict[str, Callable[[re.Match[str]], dict[str, Any]]] = {
+    "end": _between_filter_from_match,
+    "values": _in_filter_from_match,
+}
+
+
+@lru_cache(maxsize=1024)
+def _parse_filter_expr_cached(filter_text: str) -> dict[str, Any]:
     text = filter_text.strip()
-    source = "step_b_filters"
     if not text:
-        return {"expr": text, "source": source}
-
-    between_match = re.match(r"^(?P<field>.+?)\s+[bB][eE][tT][wW][eE][eE][nN]\s+(?P<start>.+?)\s+[aA][nN][dD]\s+(?P<end>.+)$", text)
-    if between_match:
-        return {
-            "field": between_match.group("field").strip(),
-            "op": "between",
-            "value": [
-                _parse_scalar_filter_value(between_match.group("start")),
-                _parse_scalar_filter_value(between_match.group("end")),
-            ],
-            "source": source,
-        }
+        return {"expr": text, "source": _STEP_B_FILTER_SOURCE}
 
-    in_match = re.match(r"^(?P<field>.+?)\s+[iI][nN]\s*\((?P<values>.+)\)$", text)
-    if in_match:
-        raw_values = [v.strip() for v in in_match.group("values").split(",")]
-        values = [_parse_scalar_filter_value(v) for v in raw_values if v]
-        return {
-            "field": in_match.group("field").strip(),
-            "op": "in",
-            "value": values,
-            "source": source,
-        }
+    range_match = _RANGE_FILTER_PATTERN.fullmatch(text)
+    if range_match:
+        # the last group to close tells which alternative matched
+        return _RANGE_FILTER_HANDLERS[range_match.lastgroup](range_match)
 
     normalized_text = text.replace("＝", "=")
-    for op in ("!=", ">=", "<=", "=", ">", "<"):
-        if op not in normalized_text:
-            continue
-        lhs, rhs = normalized_text.split(op, 1)
-        field = lhs.strip()
-        value_text = rhs.strip()
+    # one scan collects every operator; the highest-priority op wins at its first occurrence
+    op_match = None
+    best_priority = len(_COMPARISON_OP_PRIORITY)
+    for candidate in _COMPARISON_OP_PATTERN.finditer(normalized_text):
+        priority = _COMPARISON_OP_PRIORITY[candidate.group()]
+        if priority < best_priority:
+            op_match, best_priority = candidate, priority
+            if priority == 0:
+                break
+    if op_match is not None:
+        field = normalized_text[: op_match.start()].strip()
+        value_text = normalized_text[op_match.end() :].strip()
         if field and value_text:
             return {
                 "field": field,
-                "op": op,
+                "op": op_match.group(),
                 "value": _parse_scalar_filter_value(value_text),
-                "source": source,
+                "source": _STEP_B_FILTER_SOURCE,
             }
-        break
 
-    return {"expr": text, "source": source}
+    return {"expr": text, "source": _STEP_B_FILTER_SOURCE}
 
 
 def _add_alias(alias_lookup: dict[str, str], alias: str, canonical: str) -> None:
@@ -131,64 +166,140 @@ def _add_alias(alias_lookup: dict[str, str], alias: str, canonical: str) -> None
         alias_lookup[key] = canonical
 
 
+def clear_semantic_caches() -> None:
+    """Drop cached per-layer lookups, e.g. after mutating a loaded layer in place."""
+    _ALIAS_LOOKUP_CACHE.clear()
+    _METRIC_PHRASE_INDEX_CACHE.clear()
+    _TIME_DIM_CACHE.clear()
+
+
 def _build_field_alias_lookup(semantic_layer: dict[str, Any] | None, dataset_name: str) -> dict[str, str]:
     if semantic_layer is None:
         return {}
 
+    cache_key = (id(semantic_layer), dataset_name)
+    cached = _ALIAS_LOOKUP_CACHE.get(cache_key)
+    if cached is not None and cached[0] is semantic_layer:
+        return cached[1]
+
+    alias_lookup = _build_field_alias_lookup_uncached(semantic_layer, dataset_name)
+    if len(_ALIAS_LOOKUP_CACHE) >= _SEMANTIC_CACHE_MAX_ENTRIES:
+        _ALIAS_LOOKUP_CACHE.clear()
+    _ALIAS_LOOKUP_CACHE[cache_key] = (semantic_layer, alias_lookup)
+    return alias_lookup
+
+
+def _add_item_aliases(alias_lookup: dict[str, str], owner: str, item: dict[str, Any]) -> str:
+    """Register the canonical name, bare name and synonyms of one dimension/field; returns the canonical or ""."""
+    name = str(item.get("name", "") or "").strip()
+    if not name:
+        return ""
+    canonical = f"{owner}.{name}"
+    _add_alias(alias_lookup, canonical, canonical)
+    _add_alias(alias_lookup, name, canonical)
+    for synonym in item.get("synonyms", []) or []:
+        _add_alias(alias_lookup, str(synonym), canonical)
+    return canonical
+
+
+def _build_field_alias_lookup_uncached(semantic_layer: dict[str, Any], dataset_name: str) -> dict[str, str]:
     alias_lookup: dict[str, str] = {}
     datasets = semantic_layer.get("datasets", {}) or {}
     entities = semantic_layer.get("entities", {}) or {}
     dataset = datasets.get(dataset_name, {}) or {}
 
     for dimension in dataset.get("dimensions", []) or []:
-        name = str(dimension.get("name", "") or "").strip()
-        if not name:
-            continue
-        canonical = f"{dataset_name}.{name}"
-        _add_alias(alias_lookup, canonical, canonical)
-        _add_alias(alias_lookup, name, canonical)
-        for synonym in dimension.get("synonyms", []) or []:
-            _add_alias(alias_lookup, str(synonym), canonical)
+        _add_item_aliases(alias_lookup, dataset_name, dimension)
 
     for time_dimension in dataset.get("time_dimensions", []) or []:
-        name = str(time_dimension.get("name", "") or "").strip()
-        if not name:
+        canonical = _add_item_aliases(alias_lookup, dataset_name, time_dimension)
+        if not canonical:
             continue
-        canonical = f"{dataset_name}.{name}"
-        _add_alias(alias_lookup, canonical, canonical)
-        _add_alias(alias_lookup, name, canonical)
-        for synonym in time_dimension.get("synonyms", []) or []:
-            _add_alias(alias_lookup, str(synonym), canonical)
         grain = str(time_dimension.get("grain", "") or "").strip().lower()
         if grain == "month":
             for month_alias in ("月份", "month", "month_id", "年月", "月度"):
                 _add_alias(alias_lookup, month_alias, canonical)
 
-    join_entities = [
-        str(j.get("entity", "") or "").strip()
-        for j in dataset.get("joins", []) or []
-        if isinstance(j, dict) and str(j.get("entity", "") or "").strip()
-    ]
-    if not dataset_name:
-        join_entities = list(entities.keys())
+    if dataset_name:
+        # a repeated join would only re-register aliases that are already taken, so visit each entity once
+        join_entities: dict[str, None] = {}
+        for j in dataset.get("joins", []) or []:
+            if isinstance(j, dict):
+                entity_name = str(j.get("entity", "") or "").strip()
+                if entity_name:
+                    join_entities[entity_name] = None
+    else:
+        join_entities = dict.fromkeys(entities)
     for entity_name in join_entities:
         entity = entities.get(entity_name, {}) or {}
         for field in entity.get("fields", []) or []:
-            name = str(field.get("name", "") or "").strip()
-            if not name:
-                continue
-            canonical = f"{entity_name}.{name}"
-            _add_alias(alias_lookup, canonical, canonical)
-            _add_alias(alias_lookup, name, canonical)
-            for synonym in field.get("synonyms", []) or []:
-                _add_alias(alias_lookup, str(synonym), canonical)
-            if entity_name == "customer" and name == "customer_id":
+            canonical = _add_item_aliases(alias_lookup, entity_name, field)
+            if canonical == "customer.customer_id":
                 for customer_id_alias in ("客戶", "客户", "客戶ID", "客户ID", "客戶編號", "客户编号", "cust_id", "client_id"):
                     _add_alias(alias_lookup, customer_id_alias, canonical)
 
     return alias_lookup
 
 
+@dataclass(frozen=True, slots=True)
+class _MetricPhraseIndex:
+    canonicals: tuple[str, ...]
+    # normalized alias -> indexes into canonicals, for the "alias inside ask" direction
+    metric_ids_by_alias: dict[str, tuple[int, ...]]
+    max_alias_len: int
+    # all aliases joined by NUL, for the "ask inside alias" direction via str.find
+    joined_aliases: str
+    alias_starts: tuple[int, ...]
+    alias_metric_ids: tuple[int, ...]
+
+
+def _build_metric_phrase_index(semantic_layer: dict[str, Any]) -> _MetricPhraseIndex:
+    cached = _METRIC_PHRASE_INDEX_CACHE.get(id(semantic_layer))
+    if cached is not None and cached[0] is semantic_layer:
+        return cached[1]
+
+    canonicals: list[str] = []
+    metric_ids_by_alias: dict[str, list[int]] = {}
+    aliases: list[str] = []
+    alias_metric_ids: list[int] = []
+    datasets = semantic_layer.get("datasets", {}) or {}
+    for dataset_name, dataset in datasets.items():
+        for metric in dataset.get("metrics", []) or []:
+            metric_name = str(metric.get("name", "") or "").strip()
+            if not metric_name:
+                continue
+            raw_aliases = [metric_name]
+            raw_aliases.extend(str(s) for s in (metric.get("synonyms", []) or []) if str(s).strip())
+            normalized_aliases = [alias for alias in map(_normalize_phrase, raw_aliases) if alias]
+            if not normalized_aliases:
+                continue
+            metric_id = len(canonicals)
+            canonicals.append(f"{dataset_name}.{metric_name}")
+            for alias in normalized_aliases:
+                metric_ids_by_alias.setdefault(alias, []).append(metric_id)
+                aliases.append(alias)
+                alias_metric_ids.append(metric_id)
+
+    alias_starts: list[int] = []
+    offset = 0
+    for alias in aliases:
+        alias_starts.append(offset)
+        offset += len(alias) + 1
+
+    index = _MetricPhraseIndex(
+        canonicals=tuple(canonicals),
+        metric_ids_by_alias={alias: tuple(ids) for alias, ids in metric_ids_by_alias.items()},
+        max_alias_len=max(map(len, aliases), default=0),
+        joined_aliases="\x00".join(aliases),
+        alias_starts=tuple(alias_starts),
+        alias_metric_ids=tuple(alias_metric_ids),
+    )
+    if len(_METRIC_PHRASE_INDEX_CACHE) >= _SEMANTIC_CACHE_MAX_ENTRIES:
+        _METRIC_PHRASE_INDEX_CACHE.clear()
+    _METRIC_PHRASE_INDEX_CACHE[id(semantic_layer)] = (semantic_layer, index)
+    return index
+
+
 def _infer_metrics_from_features(
     extracted_features: dict[str, Any],
     semantic_layer: dict[str, Any] | None,
@@ -196,54 +307,58 @@ def _infer_metrics_from_features(
     if semantic_layer is None:
         return []
 
-    asked_metrics = [m for m in (extracted_features.get("metrics", []) or []) if isinstance(m, str) and m.strip()]
+    asked_metrics = [m for m in (extracted_features.get("metrics") or ()) if isinstance(m, str) and m.strip()]
     if not asked_metrics:
         return []
 
-    normalized_asks = [_normalize_phrase(m) for m in asked_metrics if _normalize_phrase(m)]
+    normalized_asks = [ask for ask in map(_normalize_phrase, asked_metrics) if ask]
     if not normalized_asks:
         return []
 
-    inferred: list[str] = []
-    datasets = semantic_layer.get("datasets", {}) or {}
-    for dataset_name, dataset in datasets.items():
-        for metric in dataset.get("metrics", []) or []:
-            metric_name = str(metric.get("name", "") or "").strip()
-            if not metric_name:
-                continue
-            canonical = f"{dataset_name}.{metric_name}"
-            aliases = [metric_name]
-            aliases.extend(str(s) for s in (metric.get("synonyms", []) or []) if str(s).strip())
-            normalized_aliases = [_normalize_phrase(a) for a in aliases if _normalize_phrase(a)]
-            if not normalized_aliases:
-                continue
-            for ask in normalized_asks:
-                if any((ask in alias) or (alias in ask) for alias in normalized_aliases):
-                    inferred.append(canonical)
-                    break
-
-    return _unique_keep_order(inferred)
+    index = _build_metric_phrase_index(semantic_layer)
+    joined = index.joined_aliases
+    matched_ids: set[int] = set()
+    for ask in normalized_asks:
+        # ask inside an alias: every hit in the joined string belongs to exactly one alias
+        pos = joined.find(ask)
+        while pos != -1:
+            alias_idx = bisect_right(index.alias_starts, pos) - 1
+            matched_ids.add(index.alias_metric_ids[alias_idx])
+            next_start = index.alias_starts[alias_idx + 1] if alias_idx + 1 < len(index.alias_starts) else len(joined)
+            pos = joined.find(ask, next_start)
+        # alias inside the ask: look up each substring of the ask up to the longest alias
+        ask_len = len(ask)
+        for start in range(ask_len):
+            for end in range(start + 1, min(ask_len, start + index.max_alias_len) + 1):
+                ids = index.metric_ids_by_alias.get(ask[start:end])
+                if ids:
+                    matched_ids.update(ids)
+
+    # keep semantic-layer order, as the per-metric scan did; a metric name repeated in one dataset collapses to one
+    return list(dict.fromkeys(index.canonicals[metric_id] for metric_id in sorted(matched_ids)))
 
 
 def _normalize_filter_field(parsed_filter: dict[str, Any], alias_lookup: dict[str, str], raw_filter_text: str) -> dict[str, Any]:
     field = parsed_filter.get("field")
-    if not isinstance(field, str) or not field.strip():
+    if not isinstance(field, str):
+        return parsed_filter
+    stripped_field = field.strip()
+    if not stripped_field:
         return parsed_filter
 
-    normalized_key = _normalize_key(field)
-    canonical = alias_lookup.get(normalized_key)
+    canonical = alias_lookup.get(stripped_field.lower())
     if canonical:
-        out = dict(parsed_filter)
-        out["field"] = canonical
-        return out
+        # parsed_filter is always a fresh dict from _parse_filter_expr/_expand_filter_shortcuts, so update it in place
+        parsed_filter["field"] = canonical
+        return parsed_filter
 
     # keep canonical-like field names (e.g. branch.region) as-is
-    if "." in field.strip():
+    if "." in stripped_field:
         return parsed_filter
 
     return {
         "expr": raw_filter_text.strip(),
-        "source": parsed_filter.get("source", "step_b_filters"),
+        "source": parsed_filter.get("source", _STEP_B_FILTER_SOURCE),
     }
 
 
@@ -257,7 +372,7 @@ def _expand_filter_shortcuts(
     if not expr:
         return parsed_filter
 
-    dpd_match = re.match(r"^dpd\s*(\d+)$", expr, flags=re.IGNORECASE)
+    dpd_match = _DPD_SHORTCUT_PATTERN.fullmatch(expr)
     if not dpd_match:
         return parsed_filter
 
@@ -276,7 +391,7 @@ def _expand_filter_shortcuts(
         "field": f"{selected_dataset}.overdue_days",
         "op": ">=",
         "value": int(dpd_match.group(1)),
-        "source": parsed_filter.get("source", "step_b_filters"),
+        "source": parsed_filter.get("source", _STEP_B_FILTER_SOURCE),
     }
 
 
@@ -284,45 +399,58 @@ def _build_step_b_filters(
     extracted_features: dict[str, Any],
     semantic_layer: dict[str, Any] | None,
     selected_dataset: str,
+    month_field: str = "",
 ) -> list[dict[str, Any]]:
+    """Parse Step B filter strings; with month_field set, drop filters that conflict with the query-text month range."""
     alias_lookup = _build_field_alias_lookup(semantic_layer, selected_dataset)
     selected_filters: list[dict[str, Any]] = []
-    for f in extracted_features.get("filters", []) or []:
+    for f in extracted_features.get("filters") or ():
         if not isinstance(f, str) or not f.strip():
             continue
         parsed = _parse_filter_expr(f)
         expanded = _expand_filter_shortcuts(parsed, f, selected_dataset, semantic_layer)
         normalized = _normalize_filter_field(expanded, alias_lookup, f)
+        if month_field and _conflicts_with_month_range(normalized, month_field):
+            continue
         selected_filters.append(normalized)
     return selected_filters
 
 
-def _resolve_time_filter_field(selected_dataset: str, semantic_layer: dict[str, Any] | None) -> str:
+def _resolve_time_dim(selected_dataset: str, semantic_layer: dict[str, Any] | None) -> tuple[str, str]:
+    """Return (time filter field, time grain) for a dataset, read in one walk of its time_dimensions."""
     if not selected_dataset or semantic_layer is None:
-        return "calendar.biz_date"
-    dataset = (semantic_layer.get("datasets", {}) or {}).get(selected_dataset, {}) or {}
-    for time_dimension in dataset.get("time_dimensions", []) or []:
-        name = str(time_dimension.get("name", "") or "").strip()
-        if name:
-            return f"{selected_dataset}.{name}"
-    return "calendar.biz_date"
+        return "calendar.biz_date", ""
 
+    cache_key = (id(semantic_layer), selected_dataset)
+    cached = _TIME_DIM_CACHE.get(cache_key)
+    if cached is not None and cached[0] is semantic_layer:
+        return cached[1]
 
-def _resolve_time_dimension_grain(selected_dataset: str, semantic_layer: dict[str, Any] | None) -> str:
-    if not selected_dataset or semantic_layer is None:
-        return ""
+    # field and grain each come from the first time dimension that defines them, which may differ
+    field = ""
+    grain = ""
     dataset = (semantic_layer.get("datasets", {}) or {}).get(selected_dataset, {}) or {}
     for time_dimension in dataset.get("time_dimensions", []) or []:
-        grain = str(time_dimension.get("grain", "") or "").strip().lower()
-        if grain:
-            return grain
-    return ""
+        if not field:
+            name = str(time_dimension.get("name", "") or "").strip()
+            if name:
+                field = f"{selected_dataset}.{name}"
+        if not grain:
+            grain = str(time_dimension.get("grain", "") or "").strip().lower()
+        if field and grain:
+            break
+
+    resolved = (field or "calendar.biz_date", grain)
+    if len(_TIME_DIM_CACHE) >= _SEMANTIC_CACHE_MAX_ENTRIES:
+        _TIME_DIM_CACHE.clear()
+    _TIME_DIM_CACHE[cache_key] = (semantic_layer, resolved)
+    return resolved
 
 
 def _normalize_time_bound_value(value: str, grain: str) -> str:
     text = value.strip()
     if grain == "month":
-        month_match = re.match(r"^\d{4}-\d{2}(?:-\d{2})?$", text)
+        month_match = _MONTH_BOUND_PATTERN.fullmatch(text)
         if month_match:
             return text[:7]
     return text
@@ -331,35 +459,34 @@ def _normalize_time_bound_value(value: str, grain: str) -> str:
 def _extract_month_tokens(query_text: Any) -> list[str]:
     if not isinstance(query_text, str) or not query_text.strip():
         return []
-    months = re.findall(r"(\d{4})[-年/](\d{1,2})", query_text)
-    normalized: list[str] = []
-    for year, month in months:
-        mm = month.zfill(2)
-        if 1 <= int(mm) <= 12:
-            normalized.append(f"{year}-{mm}")
-    return _unique_keep_order(normalized)
+    # extract and dedupe in one pass; \d also matches non-ASCII digits, so the range check stays numeric
+    seen: dict[str, None] = {}
+    for match in _YEAR_MONTH_TOKEN_PATTERN.finditer(query_text):
+        month = match.group(2)
+        if 1 <= int(month) <= 12:
+            seen[f"{match.group(1)}-{month if len(month) == 2 else '0' + month}"] = None
+    return list(seen)
 
 
 def _build_time_filter_from_bounds(
-    time_start: str,
-    time_end: str,
+    time_start: Any,
+    time_end: Any,
     selected_dataset: str,
     semantic_layer: dict[str, Any] | None,
 ) -> list[dict[str, Any]]:
-    if not isinstance(time_start, str) or not isinstance(time_end, str):
-        return []
-    start = time_start.strip()
-    end = time_end.strip()
+    # LLM features are almost always strings already; only coerce the odd non-string bound
+    start = (time_start if isinstance(time_start, str) else str(time_start)).strip()
+    end = (time_end if isinstance(time_end, str) else str(time_end)).strip()
     if not start or not end:
         return []
 
-    grain = _resolve_time_dimension_grain(selected_dataset, semantic_layer)
+    field, grain = _resolve_time_dim(selected_dataset, semantic_layer)
     normalized_start = _normalize_time_bound_value(start, grain)
     normalized_end = _normalize_time_bound_value(end, grain)
 
     return [
         {
-            "field": _resolve_time_filter_field(selected_dataset, semantic_layer),
+            "field": field,
             "op": "between",
             "value": [normalized_start, normalized_end],
             "source": "step_b_time_bounds",
@@ -367,52 +494,38 @@ def _build_time_filter_from_bounds(
     ]
 
 
-def _prune_conflicting_month_filters(selected_filters: list[dict[str, Any]], month_field: str) -> list[dict[str, Any]]:
-    pruned: list[dict[str, Any]] = []
-    for f in selected_filters:
-        if not isinstance(f, dict):
-            continue
-        source = str(f.get("source", "") or "")
-        field = str(f.get("field", "") or "")
-        op = str(f.get("op", "") or "").strip().lower()
-        expr = str(f.get("expr", "") or "")
-        if source == "step_b_time_bounds":
-            continue
-        if field == month_field and op in {"=", "between", "in"} and source == "step_b_filters":
-            continue
-        if source == "step_b_filters" and "月份" in expr:
-            continue
-        pruned.append(f)
-    return pruned
+def _conflicts_with_month_range(f: dict[str, Any], month_field: str) -> bool:
+    # only step_b filters can conflict; other sources pass through without reading field/op/expr
+    if f.get("source") != _STEP_B_FILTER_SOURCE:
+        return False
+    if f.get("field") == month_field and str(f.get("op", "") or "").strip().lower() in _MONTH_CONFLICT_OPS:
+        return True
+    return "月份" in str(f.get("expr", "") or "")
 
 
-def build_semantic_plan(
+def _assemble_plan(
     extracted_features: dict[str, Any],
     token_hits: dict[str, Any],
-    semantic_layer: dict[str, Any] | None = None,
+    semantic_layer: dict[str, Any] | None,
+    selected_metrics: list[str],
+    selected_dimensions: list[str],
+    selected_datasets: list[str],
 ) -> dict[str, Any]:
-    matches = token_hits.get("matches", []) or []
-
-    selected_metrics = _canonical_candidates(matches, "metric")
-    selected_dimensions = _dimension_candidates(matches)
-    dataset_candidates = _dataset_candidates(matches)
-    primary_dataset = dataset_candidates[0] if dataset_candidates else ""
-
-    selected_filters = _build_step_b_filters(extracted_features, semantic_layer, primary_dataset)
-    selected_filters.extend(
-        _build_time_filter_from_bounds(
-            str(extracted_features.get("time_start", "") or ""),
-            str(extracted_features.get("time_end", "") or ""),
-            primary_dataset,
-            semantic_layer,
-        )
-    )
+    """Attach filters, rejections and clarification state shared by both plan builders."""
+    primary_dataset = selected_datasets[0] if selected_datasets else ""
 
-    grain = _resolve_time_dimension_grain(primary_dataset, semantic_layer)
+    month_field, grain = _resolve_time_dim(primary_dataset, semantic_layer)
     month_tokens = _extract_month_tokens(extracted_features.get("query_text", ""))
-    if grain == "month" and len(month_tokens) >= 2:
-        month_field = _resolve_time_filter_field(primary_dataset, semantic_layer)
-        selected_filters = _prune_conflicting_month_filters(selected_filters, month_field)
+    # two or more months in the question replace conflicting month filters and the Step B time bounds
+    use_month_range = grain == "month" and len(month_tokens) >= 2
+
+    selected_filters = _build_step_b_filters(
+        extracted_features,
+        semantic_layer,
+        primary_dataset,
+        month_field if use_month_range else "",
+    )
+    if use_month_range:
         selected_filters.append(
             {
                 "field": month_field,
@@ -421,16 +534,25 @@ def build_semantic_plan(
                 "source": "query_text_month_bounds",
             }
         )
+    else:
+        selected_filters.extend(
+            _build_time_filter_from_bounds(
+                extracted_features.get("time_start") or "",
+                extracted_features.get("time_end") or "",
+                primary_dataset,
+                semantic_layer,
+            )
+        )
 
-    blocked = token_hits.get("blocked_matches", []) or []
-    rejected_candidates = [
-        {
-            "canonical_name": b.get("canonical_name", ""),
-            "reason": "sensitive_or_disallowed",
-        }
-        for b in blocked
-        if b.get("canonical_name")
-    ]
+    # usually nothing is blocked; skip building the comprehension in that case
+    blocked = token_hits.get("blocked_matches")
+    rejected_candidates: list[dict[str, Any]] = []
+    if blocked:
+        rejected_candidates = [
+            {"canonical_name": canonical_name, "reason": "sensitive_or_disallowed"}
+            for b in blocked
+            if (canonical_name := b.get("canonical_name"))
+        ]
 
     needs_clarification = not selected_metrics and not selected_dimensions
     clarification_questions: list[str] = []
@@ -441,13 +563,31 @@ def build_semantic_plan(
         "selected_metrics": selected_metrics,
         "selected_dimensions": selected_dimensions,
         "selected_filters": selected_filters,
-        "selected_dataset_candidates": dataset_candidates,
+        "selected_dataset_candidates": selected_datasets,
         "rejected_candidates": rejected_candidates,
         "needs_clarification": needs_clarification,
         "clarification_questions": clarification_questions,
     }
 
 
+def build_semantic_plan(
+    extracted_features: dict[str, Any],
+    token_hits: dict[str, Any],
+    semantic_layer: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    matches = token_hits.get("matches") or ()
+
+    selected_metrics, selected_dimensions, dataset_candidates = _partition_candidates(matches)
+    return _assemble_plan(
+        extracted_features,
+        token_hits,
+        semantic_layer,
+        selected_metrics,
+        selected_dimensions,
+        dataset_candidates,
+    )
+
+
 def _infer_dimensions_from_features(
     extracted_features: dict[str, Any],
     selected_dataset: str,
@@ -490,13 +630,9 @@ def _canonicalize_dimensions_for_dataset(
         return selected_dimensions
     dataset_time_canonical = f"{selected_dataset}.{primary_time_name}"
 
-    normalized: list[str] = []
-    for dim in selected_dimensions:
-        if dim == "calendar.biz_date":
-            normalized.append(dataset_time_canonical)
-        else:
-            normalized.append(dim)
-    return _unique_keep_order(normalized)
+    return list(
+        dict.fromkeys(dataset_time_canonical if dim == "calendar.biz_date" else dim for dim in selected_dimensions)
+    )
 
 
 def _filter_dimensions_for_dataset(
@@ -508,14 +644,16 @@ def _filter_dimensions_for_dataset(
         return selected_dimensions
 
     entities = semantic_layer.get("entities", {}) or {}
-    filtered: list[str] = []
-    for dim in selected_dimensions:
-        if not isinstance(dim, str) or "." not in dim:
-            continue
-        owner = dim.split(".", 1)[0]
-        if owner == selected_dataset or owner in entities:
-            filtered.append(dim)
-    return _unique_keep_order(filtered)
+    # filter and dedupe in one pass
+    return list(
+        dict.fromkeys(
+            dim
+            for dim in selected_dimensions
+            if isinstance(dim, str)
+            and "." in dim
+            and ((owner := dim.split(".", 1)[0]) == selected_dataset or owner in entities)
+        )
+    )
 
 
 def _infer_datasets_from_dimensions(
@@ -554,29 +692,17 @@ def merge_llm_selection_into_plan(
     semantic_layer: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
     """Deterministically assemble semantic plan from Step C candidates."""
-    matches = token_hits.get("matches", []) or []
-    metric_candidates = _canonical_candidates(matches, "metric")
-    dimension_candidates = _dimension_candidates(matches)
-    dataset_candidates = _dataset_candidates(matches)
+    matches = token_hits.get("matches") or ()
+    # one pass over Step C matches yields the deterministic candidate order for all three lists
+    selected_metrics, selected_dimensions, selected_datasets = _partition_candidates(matches)
 
     # Step D (LLM semantic selection) removed; keep parameter for backward compatibility.
     _ = llm_selection
 
-    selected_metrics = metric_candidates
-    selected_dimensions = dimension_candidates
-    selected_datasets = dataset_candidates
-
-    # fallback: if LLM did not select, use deterministic candidate order from Step C
-    if not selected_metrics:
-        selected_metrics = metric_candidates
     if not selected_metrics:
         selected_metrics = _infer_metrics_from_features(extracted_features, semantic_layer)
-    if not selected_datasets:
-        selected_datasets = dataset_candidates
-    if not selected_dimensions:
-        selected_dimensions = dimension_candidates
     if not selected_datasets and selected_metrics:
-        selected_datasets = _unique_keep_order([m.split(".", 1)[0] for m in selected_metrics if "." in m])
+        selected_datasets = list(dict.fromkeys(m.split(".", 1)[0] for m in selected_metrics if "." in m))
     if not selected_datasets:
         selected_datasets = _infer_datasets_from_dimensions(selected_dimensions, semantic_layer)
 
@@ -587,52 +713,11 @@ def merge_llm_selection_into_plan(
     selected_dimensions = _filter_dimensions_for_dataset(selected_dimensions, primary_dataset, semantic_layer)
     selected_dimensions = _canonicalize_dimensions_for_dataset(selected_dimensions, primary_dataset, semantic_layer)
 
-    selected_filters = _build_step_b_filters(extracted_features, semantic_layer, primary_dataset)
-
-    selected_filters.extend(
-        _build_time_filter_from_bounds(
-            str(extracted_features.get("time_start", "") or ""),
-            str(extracted_features.get("time_end", "") or ""),
-            primary_dataset,
-            semantic_layer,
-        )
+    return _assemble_plan(
+        extracted_features,
+        token_hits,
+        semantic_layer,
+        selected_metrics,
+        selected_dimensions,
+        selected_datasets,
     )
-
-    grain = _resolve_time_dimension_grain(primary_dataset, semantic_layer)
-    month_tokens = _extract_month_tokens(extracted_features.get("query_text", ""))
-    if grain == "month" and len(month_tokens) >= 2:
-        month_field = _resolve_time_filter_field(primary_dataset, semantic_layer)
-        selected_filters = _prune_conflicting_month_filters(selected_filters, month_field)
-        selected_filters.append(
-            {
-                "field": month_field,
-                "op": "between",
-                "value": [month_tokens[0], month_tokens[-1]],
-                "source": "query_text_month_bounds",
-            }
-        )
-
-    blocked = token_hits.get("blocked_matches", []) or []
-    rejected_candidates = [
-        {
-            "canonical_name": b.get("canonical_name", ""),
-            "reason": "sensitive_or_disallowed",
-        }
-        for b in blocked
-        if b.get("canonical_name")
-    ]
-
-    needs_clarification = not selected_metrics and not selected_dimensions
-    clarification_questions: list[str] = []
-    if needs_clarification:
-        clarification_questions.append("請補充要查詢的指標或維度名稱。")
-
-    return {
-        "selected_metrics": selected_metrics,
-        "selected_dimensions": selected_dimensions,
-        "selected_filters": selected_filters,
-        "selected_dataset_candidates": selected_datasets,
-        "rejected_candidates": rejected_candidates,
-        "needs_clarification": needs_clarification,
-        "clarification_questions": clarification_questions,
-    }
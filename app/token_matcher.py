@@ -1,17 +1,19 @@
 from __future__ import annotations
 
-import json
 import math
+import sys
 from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
 from typing import Any
-from urllib import request
 
-import yaml
+import httpx
 from langchain_openai import OpenAIEmbeddings
 
+from app.semantic_loader import load_semantic_layer
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class SemanticEntry:
     object_type: str
     canonical_name: str
@@ -56,6 +58,7 @@ class SemanticTokenMatcher:
         reranker_model: str | None = None,
         reranker_api_key: str = "empty",
         reranker_score_threshold: float = 0.0,
+        http_client: httpx.Client | None = None,
     ):
         self.semantic_yaml_path = Path(semantic_yaml_path)
         self.embedding_base_url = (embedding_base_url or "").strip()
@@ -65,6 +68,7 @@ class SemanticTokenMatcher:
         self.reranker_model = (reranker_model or "").strip()
         self.reranker_api_key = (reranker_api_key or "empty").strip() or "empty"
         self.reranker_score_threshold = float(reranker_score_threshold)
+        self.http_client = http_client
         self.embedding_client = self._build_embedding_client()
 
         (
@@ -75,6 +79,13 @@ class SemanticTokenMatcher:
             self.time_index,
         ) = self._build_entries_and_indexes()
         self._entry_lookup: dict[str, SemanticEntry] = {e.canonical_name: e for e in self.entries}
+        self._entry_indexes_by_alias = self._build_alias_entry_index(self.entries)
+        # exact-match payloads never change per entry; match() hands out copies
+        self._exact_payloads = [self._to_match_payload(e, source="exact") for e in self.entries]
+        # flat (alias, entry index) pairs in entry order for the substring scan over the raw query text
+        self._substring_aliases = tuple(
+            (alias, idx) for idx, entry in enumerate(self.entries) for alias in dict.fromkeys(entry.aliases) if alias
+        )
         self._semantic_docs = self._build_semantic_docs()
 
     def _build_embedding_client(self) -> OpenAIEmbeddings | None:
@@ -85,6 +96,7 @@ class SemanticTokenMatcher:
                 model=self.embedding_model,
                 base_url=self.embedding_base_url,
                 api_key=self.embedding_api_key,
+                http_client=self.http_client,
             )
         except Exception:
             return None
@@ -98,10 +110,8 @@ class SemanticTokenMatcher:
         dict[str, dict[str, Any]],
         dict[str, dict[str, str]],
     ]:
-        with self.semantic_yaml_path.open("r", encoding="utf-8") as f:
-            semantic = yaml.safe_load(f) or {}
-
-        layer = semantic.get("semantic_layer", {})
+        # shares the parsed layer with load_semantic_layer() callers instead of parsing the YAML twice
+        layer = load_semantic_layer(self.semantic_yaml_path)
         entries: list[SemanticEntry] = []
         metric_index: dict[str, dict[str, Any]] = {}
         dimension_index: dict[str, dict[str, Any]] = {}
@@ -211,6 +221,15 @@ class SemanticTokenMatcher:
 
         return entries, metric_index, dimension_index, filter_field_index, time_index
 
+    @staticmethod
+    def _build_alias_entry_index(entries: list[SemanticEntry]) -> dict[str, tuple[int, ...]]:
+        # alias -> indexes of the entries carrying it, in entry order, so exact matching is one dict probe per value
+        index: dict[str, list[int]] = {}
+        for idx, entry in enumerate(entries):
+            for alias in dict.fromkeys(entry.aliases):
+                index.setdefault(alias, []).append(idx)
+        return {alias: tuple(entry_indexes) for alias, entry_indexes in index.items()}
+
     @staticmethod
     def _normalize(text: str) -> str:
         return text.strip().lower()
@@ -221,7 +240,8 @@ class SemanticTokenMatcher:
         expr = item.get("expr")
         if isinstance(expr, str) and expr:
             aliases.append(expr)
-        return [self._normalize(a) for a in aliases if isinstance(a, str) and a.strip()]
+        # interned so the alias indexes and every entry sharing an alias hold one string object
+        return [sys.intern(self._normalize(a)) for a in aliases if isinstance(a, str) and a.strip()]
 
     def _build_semantic_docs(self) -> list[dict[str, str]]:
         docs: list[dict[str, str]] = []
@@ -262,7 +282,7 @@ class SemanticTokenMatcher:
     def _build_exact_matches(self, extracted_features: dict[str, Any]) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
         values: list[str] = []
         for key in ("tokens", "metrics", "dimensions"):
-            for v in extracted_features.get(key, []) or []:
+            for v in extracted_features.get(key) or ():
                 if isinstance(v, str) and v.strip():
                     values.append(self._normalize(v))
 
@@ -275,25 +295,27 @@ class SemanticTokenMatcher:
         matches: list[dict[str, Any]] = []
         blocked: list[dict[str, Any]] = []
 
-        def _append_entry(entry: SemanticEntry) -> None:
-            if entry.canonical_name in seen:
+        exact_payloads = self._exact_payloads
+
+        def _append_entry(idx: int) -> None:
+            template = exact_payloads[idx]
+            canonical_name = template["canonical_name"]
+            if canonical_name in seen:
                 return
-            seen.add(entry.canonical_name)
-            payload = self._to_match_payload(entry, source="exact")
-            if entry.allowed:
-                matches.append(payload)
+            seen.add(canonical_name)
+            if template["allowed"]:
+                matches.append(template.copy())
             else:
-                blocked.append(payload)
+                blocked.append(template.copy())
 
         for value in values:
-            for entry in self.entries:
-                if value in entry.aliases:
-                    _append_entry(entry)
+            for idx in self._entry_indexes_by_alias.get(value, ()):
+                _append_entry(idx)
 
         if normalized_query_text:
-            for entry in self.entries:
-                if any(alias and alias in normalized_query_text for alias in entry.aliases):
-                    _append_entry(entry)
+            for alias, idx in self._substring_aliases:
+                if alias in normalized_query_text:
+                    _append_entry(idx)
 
         return matches, blocked
 
@@ -341,19 +363,15 @@ class SemanticTokenMatcher:
         }
 
         endpoint = self.reranker_base_url.rstrip("/") + "/rerank"
-        req = request.Request(
-            endpoint,
-            method="POST",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.reranker_api_key}",
-            },
-            data=json.dumps(payload).encode("utf-8"),
-        )
+        headers = {"Authorization": f"Bearer {self.reranker_api_key}"}
 
         try:
-            with request.urlopen(req, timeout=10) as resp:
-                body = json.loads(resp.read().decode("utf-8"))
+            if self.http_client is not None:
+                resp = self.http_client.post(endpoint, json=payload, headers=headers, timeout=10)
+            else:
+                resp = httpx.post(endpoint, json=payload, headers=headers, timeout=10)
+            resp.raise_for_status()
+            body = resp.json()
             results = body.get("results", []) or []
             ranked: list[dict[str, Any]] = []
             for item in results:
@@ -383,12 +401,18 @@ class SemanticTokenMatcher:
         self,
         extracted_features: dict[str, Any],
     ) -> dict[str, Any]:
+        metric_get = self.metric_index.get
+        # normalized once here and reused by the dataset probes below
+        normalized_metrics = [
+            self._normalize(metric)
+            for metric in extracted_features.get("metrics") or ()
+            if isinstance(metric, str) and metric.strip()
+        ]
+
         metric_refs: list[dict[str, str]] = []
         seen_metric_names: set[str] = set()
-        for metric in extracted_features.get("metrics", []) or []:
-            if not isinstance(metric, str) or not metric.strip():
-                continue
-            mapped = self.metric_index.get(self._normalize(metric))
+        for normalized_metric in normalized_metrics:
+            mapped = metric_get(normalized_metric)
             if not mapped:
                 continue
             mapped_name = str(mapped.get("name", "") or "")
@@ -405,7 +429,7 @@ class SemanticTokenMatcher:
 
         dimension_refs: list[dict[str, str]] = []
         seen_dimension_exprs: set[str] = set()
-        for dimension in extracted_features.get("dimensions", []) or []:
+        for dimension in extracted_features.get("dimensions") or ():
             if not isinstance(dimension, str) or not dimension.strip():
                 continue
             mapped = self.dimension_index.get(self._normalize(dimension))
@@ -424,7 +448,7 @@ class SemanticTokenMatcher:
 
         filter_refs: list[dict[str, str]] = []
         seen_filters: set[tuple[str, str, str]] = set()
-        for filter_text in extracted_features.get("filters", []) or []:
+        for filter_text in extracted_features.get("filters") or ():
             if not isinstance(filter_text, str) or "=" not in filter_text:
                 continue
             lhs, rhs = filter_text.split("=", 1)
@@ -442,30 +466,17 @@ class SemanticTokenMatcher:
             seen_filters.add(dedupe_key)
             filter_refs.append({"expr": expr, "op": "=", "value": value})
 
+        # first requested metric, then first token, that maps to a metric with a dataset
         dataset = ""
-        if metric_refs:
-            first_metric_key = self._normalize(str((extracted_features.get("metrics", []) or [""])[0]))
-            metric_mapped = self.metric_index.get(first_metric_key)
+        normalized_tokens = (
+            self._normalize(value) for value in extracted_features.get("tokens") or () if isinstance(value, str)
+        )
+        for candidate in chain(normalized_metrics, normalized_tokens):
+            metric_mapped = metric_get(candidate)
             if metric_mapped:
                 dataset = str(metric_mapped.get("dataset", "") or "")
-        if not dataset:
-            for metric in extracted_features.get("metrics", []) or []:
-                if not isinstance(metric, str):
-                    continue
-                metric_mapped = self.metric_index.get(self._normalize(metric))
-                if metric_mapped:
-                    dataset = str(metric_mapped.get("dataset", "") or "")
-                    if dataset:
-                        break
-        if not dataset:
-            for value in extracted_features.get("tokens", []) or []:
-                if not isinstance(value, str):
-                    continue
-                maybe_metric = self.metric_index.get(self._normalize(value))
-                if maybe_metric:
-                    dataset = str(maybe_metric.get("dataset", "") or "")
-                    if dataset:
-                        break
+                if dataset:
+                    break
 
         time_field = str(self.time_index.get(dataset, {}).get("time_field", "") or "") if dataset else ""
 
@@ -489,23 +500,34 @@ class SemanticTokenMatcher:
             merged.append(item)
         return merged
 
-    def match(self, extracted_features: dict[str, Any]) -> dict[str, Any]:
-        exact_matches, blocked = self._build_exact_matches(extracted_features)
+    @staticmethod
+    def _build_semantic_query(extracted_features: dict[str, Any]) -> str:
         query_parts: list[str] = []
         for key in ("metrics", "dimensions", "tokens", "filters"):
-            values = extracted_features.get(key, []) or []
-            query_parts.extend([v for v in values if isinstance(v, str) and v.strip()])
+            values = extracted_features.get(key) or ()
+            query_parts.extend(v for v in values if isinstance(v, str) and v.strip())
         query_text = extracted_features.get("query_text", "")
         if isinstance(query_text, str) and query_text.strip():
             query_parts.append(query_text.strip())
-        semantic_query = " ".join(query_parts).strip()
+        return " ".join(query_parts).strip()
+
+    def match(self, extracted_features: dict[str, Any]) -> dict[str, Any]:
+        exact_matches, blocked = self._build_exact_matches(extracted_features)
+        # the joined query only feeds embedding retrieval, so skip assembling it when retrieval is off
+        semantic_query = self._build_semantic_query(extracted_features) if self.embedding_client is not None else ""
 
         embedding_hits = self._semantic_retrieve(semantic_query, top_k=8)
         reranked_hits = self._rerank(semantic_query, embedding_hits, top_k=8)
         reranked_hits = self._filter_by_rerank_threshold(reranked_hits)
 
-        retrieved_allowed = [item for item in reranked_hits if item.get("allowed") is not False]
-        retrieved_blocked = [item for item in reranked_hits if item.get("allowed") is False]
+        # split retrieved hits in one pass; exact matches are already split as they are found
+        retrieved_allowed: list[dict[str, Any]] = []
+        retrieved_blocked: list[dict[str, Any]] = []
+        for item in reranked_hits:
+            if item.get("allowed") is False:
+                retrieved_blocked.append(item)
+            else:
+                retrieved_allowed.append(item)
         blocked = self._merge_matches(blocked, retrieved_blocked)
 
         matches = self._merge_matches(exact_matches, retrieved_allowed)
@@ -1,11 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+import io
+from types import SimpleNamespace
 import unittest
+from unittest import mock
 
+from app import main
+from app.intent_router import IntentType
 from app.main import (
     _build_dataset_time_bounds_sql,
     _build_empty_result_hint,
     _compute_adjusted_time_range,
+    _detect_preferred_chart_type,
+    _iter_sql_statements,
     _replace_time_between_filter,
+    _retry_with_data_time_bounds,
 )
+from app.query_executor import QueryResult
+
+
+class _FakeExecutor:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.executed_sql = []
+
+    def run(self, sql, max_rows=1000, params=None):
+        self.executed_sql.append((sql, params))
+        return self.responses.pop(0)
 
 
 class MainDiagnosticsTests(unittest.TestCase):
@@ -77,6 +98,143 @@ class MainDiagnosticsTests(unittest.TestCase):
         self.assertIn("已自動改用可用時間範圍重新查詢", hint)
         self.assertIn("2026-01-01 ~ 2026-01-31", hint)
 
+    def test_retry_with_data_time_bounds_rebinds_compiled_sql_params(self):
+        semantic_layer = {
+            "datasets": {
+                "deposit_balance_daily": {
+                    "from": "fact_account_balance_daily as bal",
+                    "time_dimensions": [{"name": "biz_date", "expr": "bal.biz_date"}],
+                }
+            }
+        }
+        plan = {
+            "selected_dataset_candidates": ["deposit_balance_daily"],
+            "selected_filters": [
+                {"field": "deposit_balance_daily.biz_date", "op": "between", "value": ["2024-01-01", "2024-12-31"]},
+            ],
+        }
+        sql = "SELECT SUM(bal.end_balance)\nFROM fact_account_balance_daily as bal\nWHERE bal.biz_date BETWEEN %s AND %s"
+        executor = _FakeExecutor(
+            [
+                QueryResult(columns=["min_biz_date", "max_biz_date"], rows=[{"min_biz_date": "2026-01-01", "max_biz_date": "2026-01-31"}]),
+                QueryResult(columns=["total"], rows=[{"total": 1}]),
+            ]
+        )
+
+        retried = _retry_with_data_time_bounds(
+            plan, sql, ("2024-01-01", "2024-12-31"), semantic_layer, executor, max_rows=10
+        )
+
+        self.assertIsNotNone(retried)
+        adjusted_plan, adjusted_sql, adjusted_params, result, hint = retried
+        self.assertEqual(adjusted_plan["selected_filters"][0]["value"], ["2026-01-01", "2026-01-31"])
+        self.assertEqual(adjusted_sql, sql)
+        self.assertEqual(adjusted_params, ("2026-01-01", "2026-01-31"))
+        self.assertEqual(executor.executed_sql[-1], (sql, adjusted_params))
+        self.assertEqual(result.rows, [{"total": 1}])
+        self.assertIn("2026-01-01 ~ 2026-01-31", hint)
+
+    def test_detect_preferred_chart_type_keeps_type_priority_across_features(self):
+        features = {
+            "tokens": ["月度折線圖"],
+            "dimensions": ["分行"],
+            "filters": ["用圓餅圖展示"],
+        }
+
+        self.assertEqual(_detect_preferred_chart_type(features), "pie")
+        self.assertEqual(_detect_preferred_chart_type({"tokens": ["bar chart"]}), "bar")
+        self.assertIsNone(_detect_preferred_chart_type({"tokens": ["存款餘額"]}))
+
+    def test_iter_sql_statements_skips_comments_and_keeps_quoted_semicolons(self):
+        lines = [
+            "-- seed data\n",
+            "CREATE TABLE t (\n",
+            "  id INT  -- primary key; not null\n",
+            ");\n",
+            "INSERT INTO t VALUES (1, 'a;b'), (2, 'it''s');\n",
+            "SELECT 1\n",
+        ]
+
+        statements = list(_iter_sql_statements(lines))
+
+        self.assertEqual(
+            statements,
+            [
+                "CREATE TABLE t (\n  id INT  -- primary key; not null\n)",
+                "INSERT INTO t VALUES (1, 'a;b'), (2, 'it''s')",
+                "SELECT 1",
+            ],
+        )
+
+    def test_iter_sql_statements_only_treats_dash_dash_space_as_comment(self):
+        lines = [
+            "SELECT a--b FROM t;\n",
+            "SELECT 2 -- trailing; comment\n",
+            ";\n",
+            "SELECT 3--\n",
+            ";\n",
+        ]
+
+        self.assertEqual(
+            list(_iter_sql_statements(lines)),
+            ["SELECT a--b FROM t", "SELECT 2 -- trailing; comment", "SELECT 3--"],
+        )
+
+    def test_iter_sql_statements_does_not_escape_inside_backtick_identifiers(self):
+        lines = ["SELECT `dir\\` FROM t; SELECT 'it\\'s;' AS x;\n"]
+
+        self.assertEqual(
+            list(_iter_sql_statements(lines)),
+            ["SELECT `dir\\` FROM t", "SELECT 'it\\'s;' AS x"],
+        )
+
+    def test_chat_loop_reuses_result_summary_when_chart_rendering_fails(self):
+        session = mock.Mock()
+        session.extract_sql_features_with_llm.return_value = {"tokens": ["存款"]}
+        session.summarize_query_result_with_llm.return_value = "存款合計 3 筆"
+        matcher = mock.Mock()
+        matcher.match.return_value = {"matches": []}
+        executor = mock.Mock()
+        executor.run.return_value = QueryResult(columns=["total"], rows=[{"total": 3}])
+        settings = SimpleNamespace(
+            db_missing_fields=(),
+            db_host="db",
+            db_port=3306,
+            db_user="u",
+            db_password="p",
+            db_name="smartbi_demo",
+            chart_output_dir="artifacts/charts",
+        )
+        background = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(background.shutdown)
+
+        with (
+            mock.patch("builtins.input", side_effect=["查詢存款", EOFError()]),
+            mock.patch("builtins.print"),
+            mock.patch.object(main, "classify_intent", return_value=SimpleNamespace(intent=IntentType.SQL, confidence=1.0)),
+            mock.patch.object(main, "merge_llm_selection_into_plan", return_value={}),
+            mock.patch.object(main, "validate_semantic_plan", return_value={"ok": True}),
+            mock.patch.object(main, "compile_parameterized_sql_from_semantic_plan", return_value=("SELECT 1", ())),
+            mock.patch.object(main, "SQLQueryExecutor", return_value=executor),
+            mock.patch.object(main, "render_chart", side_effect=RuntimeError("render boom")),
+            self.assertLogs("smartbi", level="INFO") as logs,
+        ):
+            main._chat_loop(session, matcher, {}, {}, settings, background)
+
+        session.summarize_query_result_with_llm.assert_called_once()
+        session.summarize_failure_with_llm.assert_not_called()
+        report = logs.output[-1]
+        self.assertIn("Step G/H/I 略過或失敗：render boom", report)
+        self.assertIn("存款合計 3 筆", report)
+
+    def test_run_sql_script_file_reports_missing_file_without_main_setup(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            ok = main._run_sql_script_file("sql/does_not_exist.sql", SimpleNamespace(db_missing_fields=()))
+
+        self.assertFalse(ok)
+        self.assertIn("[Batch SQL] 檔案不存在：sql/does_not_exist.sql", out.getvalue())
+
 
 if __name__ == "__main__":
     unittest.main()
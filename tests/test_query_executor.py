@@ -0,0 +1,159 @@
+import unittest
+from unittest import mock
+
+from app import query_executor
+from app.query_executor import SQLQueryExecutor
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=None):
+        self.conn.executed.append(sql)
+        if self.conn.fail_on_execute:
+            raise RuntimeError("boom")
+        self.description = [(name,) for name in self.conn.columns]
+        self._pending = [dict(row) for row in self.conn.rows]
+
+    def fetchmany(self, size=1):
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+
+class _FakeConnection:
+    def __init__(self, rows=None, columns=None):
+        self.rows = [{"total": 1}] if rows is None else rows
+        self.columns = columns if columns is not None else (list(self.rows[0]) if self.rows else [])
+        self.executed = []
+        self.fail_on_execute = False
+        self.closed = False
+        self.pings = 0
+
+    def cursor(self, cursor=None):
+        return _FakeCursor(self)
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+
+    def close(self):
+        self.closed = True
+
+
+def _executor() -> SQLQueryExecutor:
+    return SQLQueryExecutor(host="db", port=3306, user="u", password="p", database="smartbi_demo")
+
+
+class SQLQueryExecutorTests(unittest.TestCase):
+    def setUp(self):
+        query_executor._IDLE_CONNECTIONS.clear()
+        query_executor._RESULT_CACHE.clear()
+        self.addCleanup(query_executor._IDLE_CONNECTIONS.clear)
+        self.addCleanup(query_executor._RESULT_CACHE.clear)
+
+    def test_run_reuses_pooled_connection_across_executors(self):
+        conn = _FakeConnection()
+        with mock.patch("pymysql.connect", return_value=conn) as connect:
+            _executor().run("SELECT 1 AS total", max_rows=5)
+            _executor().run("SELECT 2 AS total", max_rows=5)
+
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(conn.pings, 1)
+        self.assertFalse(conn.closed)
+        self.assertEqual(conn.executed[0], "SELECT 1 AS total\nLIMIT 5")
+
+    def test_run_does_not_return_failed_connection_to_pool(self):
+        conn = _FakeConnection()
+        conn.fail_on_execute = True
+        with mock.patch("pymysql.connect", return_value=conn):
+            with self.assertRaises(RuntimeError):
+                _executor().run("SELECT 1")
+
+        self.assertTrue(conn.closed)
+        self.assertFalse(any(query_executor._IDLE_CONNECTIONS.values()))
+
+    def test_run_serves_repeated_query_from_result_cache(self):
+        conn = _FakeConnection(rows=[{"region": "澳門半島", "total": 3}])
+        with mock.patch("pymysql.connect", return_value=conn):
+            first = _executor().run("SELECT region,  SUM(x) AS total\nFROM t WHERE region = '澳門  半島'")
+            second = _executor().run("SELECT region, SUM(x) AS total FROM t WHERE region = '澳門  半島';")
+            other = _executor().run("SELECT region, SUM(x) AS total FROM t WHERE region = '澳門 半島'")
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(conn.executed), 2)
+        self.assertEqual(other.rows, first.rows)
+
+    def test_run_does_not_share_cached_results_across_users(self):
+        conn = _FakeConnection(rows=[{"total": 3}])
+        with mock.patch("pymysql.connect", return_value=conn):
+            _executor().run("SELECT SUM(x) AS total FROM t")
+            SQLQueryExecutor(host="db", port=3306, user="auditor", password="p", database="smartbi_demo").run(
+                "SELECT SUM(x) AS total FROM t"
+            )
+
+        self.assertEqual(len(conn.executed), 2)
+
+    def test_run_returns_copies_so_callers_cannot_corrupt_cached_rows(self):
+        conn = _FakeConnection(rows=[{"region": "澳門半島", "total": 3}])
+        with mock.patch("pymysql.connect", return_value=conn):
+            first = _executor().run("SELECT region, total FROM t")
+            first.rows[0]["total"] = 99
+            first.rows.append({"region": "氹仔", "total": 1})
+            second = _executor().run("SELECT region, total FROM t")
+            second.rows.clear()
+            third = _executor().run("SELECT region, total FROM t")
+
+        self.assertEqual(len(conn.executed), 1)
+        self.assertEqual(third.rows, [{"region": "澳門半島", "total": 3}])
+
+    def test_run_streams_rows_in_chunks_and_keeps_columns_for_empty_result(self):
+        conn = _FakeConnection(rows=[{"n": i} for i in range(600)])
+        with mock.patch("pymysql.connect", return_value=conn):
+            result = _executor().run("SELECT n FROM t", max_rows=1000)
+        self.assertEqual(len(result.rows), 600)
+        self.assertEqual(result.rows[-1], {"n": 599})
+
+        empty = _FakeConnection(rows=[], columns=["region", "total"])
+        query_executor._IDLE_CONNECTIONS.clear()
+        with mock.patch("pymysql.connect", return_value=empty):
+            result = _executor().run("SELECT region, total FROM t")
+        self.assertEqual(result.columns, ["region", "total"])
+        self.assertEqual(result.rows, [])
+
+    def test_run_appends_limit_unless_outer_query_has_one(self):
+        conn = _FakeConnection()
+        with mock.patch("pymysql.connect", return_value=conn):
+            _executor().run("SELECT * FROM (SELECT x FROM t LIMIT 5) s", max_rows=10)
+            _executor().run("SELECT 'limit 3' AS note FROM t", max_rows=10)
+            _executor().run("SELECT x FROM t ORDER BY x LIMIT 3", max_rows=10)
+
+        self.assertEqual(conn.executed[0], "SELECT * FROM (SELECT x FROM t LIMIT 5) s\nLIMIT 10")
+        self.assertEqual(conn.executed[1], "SELECT 'limit 3' AS note FROM t\nLIMIT 10")
+        self.assertEqual(conn.executed[2], "SELECT x FROM t ORDER BY x LIMIT 3")
+
+    def test_unwrap_common_llm_wrappers_strips_fences_and_quotes(self):
+        unwrap = SQLQueryExecutor._unwrap_common_llm_wrappers
+
+        self.assertEqual(unwrap("```sql\nSELECT 1\nFROM t\n```"), "SELECT 1\nFROM t")
+        self.assertEqual(unwrap("```\nsql\nSELECT 1\n```"), "SELECT 1")
+        self.assertEqual(unwrap('"SELECT 1\\nFROM t"'), "SELECT 1\nFROM t")
+        self.assertEqual(unwrap("```SELECT 1```"), "```SELECT 1```")
+
+    def test_is_safe_select_blocks_write_keywords_on_word_boundaries(self):
+        self.assertTrue(SQLQueryExecutor._is_safe_select("SELECT created_at, update_count FROM t;"))
+        self.assertFalse(SQLQueryExecutor._is_safe_select("SELECT 1;\tDROP TABLE t"))
+        self.assertFalse(SQLQueryExecutor._is_safe_select("SELECT * FROM t\nWHERE 1=1\nUNION SELECT 1 FROM x\tDELETE"))
+        self.assertFalse(SQLQueryExecutor._is_safe_select("TRUNCATE TABLE t"))
+        self.assertFalse(SQLQueryExecutor._is_safe_select("SELECT 1;;"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,14 @@
+import copy
 import unittest
 
+from app import sql_compiler
 from app.semantic_validator import validate_semantic_plan
-from app.sql_compiler import compile_sql_from_semantic_plan
-from app.sql_planner import merge_llm_selection_into_plan
+from app.sql_compiler import (
+    compile_parameterized_sql_from_semantic_plan,
+    compile_sql_from_semantic_plan,
+    rebind_between_params,
+)
+from app.sql_planner import _parse_filter_expr, merge_llm_selection_into_plan
 
 
 SEMANTIC_LAYER = {
@@ -85,6 +91,23 @@ class SemanticPipelineTests(unittest.TestCase):
         self.assertEqual(merged["selected_dimensions"], ["sales.biz_date"])
         self.assertEqual(merged["selected_dataset_candidates"], ["sales"])
 
+    def test_merge_llm_selection_skips_disallowed_matches_but_keeps_their_dataset(self):
+        token_hits = {
+            "matches": [
+                {"object_type": "sensitive_field", "canonical_name": "branch.region", "dataset": "sales", "allowed": False},
+                {"object_type": "metric", "canonical_name": "sales.revenue", "dataset": "sales", "allowed": True},
+                {"object_type": "metric", "canonical_name": "sales.revenue", "dataset": "other_ds"},
+                {"object_type": "field", "canonical_name": "branch.region", "dataset": "", "allowed": True},
+            ]
+        }
+        features = {"filters": [], "time_start": "", "time_end": ""}
+
+        merged = merge_llm_selection_into_plan({}, token_hits, features, semantic_layer=SEMANTIC_LAYER)
+
+        self.assertEqual(merged["selected_metrics"], ["sales.revenue"])
+        self.assertEqual(merged["selected_dimensions"], ["branch.region"])
+        self.assertEqual(merged["selected_dataset_candidates"], ["sales", "other_ds"])
+
     def test_merge_llm_selection_normalizes_step_b_filter_expr_to_canonical_field(self):
         token_hits = {
             "matches": [
@@ -608,6 +631,102 @@ class SemanticPipelineTests(unittest.TestCase):
         self.assertIn("bal.biz_date BETWEEN '2024-01-01' AND '2024-12-31'", sql)
         self.assertNotIn("2026-01-01", sql)
 
+    def test_rebind_between_params_matches_full_recompile(self):
+        plan = {
+            "selected_metrics": ["sales.revenue"],
+            "selected_dimensions": [],
+            "selected_filters": [
+                {"field": "sales.biz_date", "op": "between", "value": ["2024-01-01", "2024-12-31"]},
+            ],
+            "selected_dataset_candidates": ["sales"],
+        }
+        adjusted_plan = {
+            **plan,
+            "selected_filters": [
+                {"field": "sales.biz_date", "op": "between", "value": ["2026-01-01", "2026-01-31"]},
+            ],
+        }
+
+        sql, params = compile_parameterized_sql_from_semantic_plan(plan, SEMANTIC_LAYER)
+        rebound = rebind_between_params(params, ("2024-01-01", "2024-12-31"), ("2026-01-01", "2026-01-31"))
+
+        self.assertEqual((sql, rebound), compile_parameterized_sql_from_semantic_plan(adjusted_plan, SEMANTIC_LAYER))
+        self.assertIsNone(rebind_between_params(params, ("2025-01-01", "2025-12-31"), ("2026-01-01", "2026-01-31")))
+
+    def test_parameterized_compile_binds_filter_values_and_escapes_percent(self):
+        layer = copy.deepcopy(SEMANTIC_LAYER)
+        layer["datasets"]["sales"]["dimensions"].append({"name": "month", "expr": "DATE_FORMAT(s.biz_date, '%Y-%m')"})
+        plan = {
+            "selected_metrics": ["sales.revenue"],
+            "selected_dimensions": ["sales.month"],
+            "selected_filters": [
+                {"field": "sales.biz_date", "op": "between", "value": ["2024-01-01", "2024-12-31"]},
+                {"field": "sales.month", "op": "in", "value": ["2024-01", "O'Neil"]},
+            ],
+            "selected_dataset_candidates": ["sales"],
+        }
+
+        sql, params = compile_parameterized_sql_from_semantic_plan(plan, layer)
+
+        self.assertIn("DATE_FORMAT(s.biz_date, '%%Y-%%m') AS sales_month", sql)
+        self.assertIn("BETWEEN %s AND %s", sql)
+        self.assertIn("IN (%s, %s)", sql)
+        self.assertEqual(params, ("2024-01-01", "2024-12-31", "2024-01", "O'Neil"))
+        inlined = compile_sql_from_semantic_plan(plan, layer)
+        self.assertIn("DATE_FORMAT(s.biz_date, '%Y-%m') IN ('2024-01', 'O''Neil')", inlined)
+
+    def test_compiler_reuses_semantic_lookup_per_layer_identity(self):
+        layer = copy.deepcopy(SEMANTIC_LAYER)
+        plan = {
+            "selected_metrics": ["sales.revenue"],
+            "selected_dimensions": [],
+            "selected_filters": [],
+            "selected_dataset_candidates": ["sales"],
+        }
+
+        first = sql_compiler._build_semantic_lookup("sales", layer)
+        self.assertIs(sql_compiler._build_semantic_lookup("sales", layer), first)
+
+        layer["datasets"]["sales"]["from"] = "fact_sales_v2 as s"
+        self.assertIn("FROM fact_sales as s", compile_sql_from_semantic_plan(plan, layer))
+        sql_compiler.clear_semantic_caches()
+        self.assertIn("FROM fact_sales_v2 as s", compile_sql_from_semantic_plan(plan, layer))
+
+    def test_parse_filter_expr_handles_between_and_in_shapes(self):
+        self.assertEqual(
+            _parse_filter_expr("biz_date BETWEEN '2024-01-01' and 2024"),
+            {"field": "biz_date", "op": "between", "value": ["2024-01-01", 2024], "source": "step_b_filters"},
+        )
+        self.assertEqual(
+            _parse_filter_expr("region in ('澳門半島', 3, )"),
+            {"field": "region", "op": "in", "value": ["澳門半島", 3], "source": "step_b_filters"},
+        )
+        self.assertEqual(_parse_filter_expr("amount >= 1.5")["value"], 1.5)
+        self.assertEqual(_parse_filter_expr("between friends"), {"expr": "between friends", "source": "step_b_filters"})
+
+    def test_parse_filter_expr_returns_unshared_copies_of_cached_parse(self):
+        first = _parse_filter_expr("region in ('澳門半島', '氹仔')")
+        first["field"] = "branch.region"
+        first["value"].append("路環")
+
+        second = _parse_filter_expr("region in ('澳門半島', '氹仔')")
+        self.assertEqual(second["field"], "region")
+        self.assertEqual(second["value"], ["澳門半島", "氹仔"])
+
+    def test_compiler_lookup_cache_evicts_least_recently_used_layer(self):
+        sql_compiler.clear_semantic_caches()
+        self.addCleanup(sql_compiler.clear_semantic_caches)
+        hot = copy.deepcopy(SEMANTIC_LAYER)
+        hot_lookup = sql_compiler._build_semantic_lookup("sales", hot)
+        cold_layers = [copy.deepcopy(SEMANTIC_LAYER) for _ in range(sql_compiler._SEMANTIC_CACHE_MAX_ENTRIES)]
+        for layer in cold_layers:
+            sql_compiler._build_semantic_lookup("sales", hot)
+            sql_compiler._build_semantic_lookup("sales", layer)
+
+        self.assertEqual(len(sql_compiler._LOOKUP_CACHE), sql_compiler._SEMANTIC_CACHE_MAX_ENTRIES)
+        self.assertIs(sql_compiler._build_semantic_lookup("sales", hot), hot_lookup)
+        self.assertNotIn((id(cold_layers[0]), "sales"), sql_compiler._LOOKUP_CACHE)
+
     def test_compiler_supports_is_not_null_filter_operator(self):
         semantic_layer = {
             "entities": {},